@@ -2,9 +2,13 @@
 #/usr/bin/python3
 #/usr/local/bin/python3
 
+import argparse
 from gtp_connection import GtpConnection
 from board_util import GoBoardUtil
 from simple_board import SimpleGoBoard
+from heuristic import load_engine_data
+from profiling import Profiler
+from reference_check import ReferenceChecker
 
 class Nogo():
     def __init__(self):
@@ -24,8 +28,47 @@ def run():
     """
     start the gtp connection and wait for commands.
     """
+    parser = argparse.ArgumentParser(description="NoGo GTP engine")
+    parser.add_argument("--profile", choices=Profiler.MODES,
+                        help="profile solve, genmove and evaluate")
+    parser.add_argument("--profile-dir", default=".",
+                        help="directory for the profile files")
+    parser.add_argument("--timers", action="store_true",
+                        help="time the hot board functions")
+    parser.add_argument("--ponder", action="store_true",
+                        help="search while waiting for commands")
+    parser.add_argument("--memory-limit", type=float, metavar="MB",
+                        help="memory ceiling, the transposition table "
+                             "evicts entries to stay under it")
+    parser.add_argument("--reference-check", type=float, metavar="RATE",
+                        help="check this fraction of the searched positions "
+                             "against the reference implementations")
+    parser.add_argument("--progress", choices=["stderr", "gfx"],
+                        help="report the progress of searches on stderr")
+    parser.add_argument("--progress-interval", type=float, default=1.0,
+                        metavar="SECONDS")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="run the GTP file in parallel and exit")
+    parser.add_argument("--jobs", type=int,
+                        help="processes for --batch, default one per CPU")
+    args = parser.parse_args()
+    if args.batch:
+        from gtp_batch import run_batch # gtp_batch imports this module
+        run_batch(args.batch, args.jobs)
+        return
+    load_engine_data()
     board = SimpleGoBoard(7)
     con = GtpConnection(Nogo(), board)
+    con.profiler.mode = args.profile
+    con.profiler.directory = args.profile_dir
+    if args.timers:
+        con.timers.enable()
+    con.ponderer.enabled = args.ponder
+    con.memory.set_limit(args.memory_limit)
+    con.progress.mode = args.progress
+    con.progress.interval = args.progress_interval
+    if args.reference_check:
+        con.reference_checker = ReferenceChecker(args.reference_check)
     con.start_connection()
 
 if __name__=='__main__':
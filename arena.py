@@ -0,0 +1,229 @@
+"""
+arena.py
+
+Self-play between two engine configurations, to check a change for
+both strength and speed.
+
+Games run in a process pool, each between two GtpConnections in the
+same process. The configurations alternate colors, and each game
+starts with a few random moves so that games differ. The report gives
+the win rate of the first configuration with a 95% confidence interval,
+and for each side the percentiles of the genmove latency and the
+search speed. A side whose genmove fails, or whose move the other side
+rejects, forfeits the game, and the report counts the forfeits.
+
+A configuration is a comma separated list of key=value, with keys
+heuristic (0 or 1), symmetry (0 or 1), proof_tree (0 or 1),
+timelimit (seconds) and board (a backend of benchmark_primitives).
+
+Usage:
+    python arena.py --a heuristic=1 --b heuristic=0 [--games N]
+                    [--size N] [--random-moves N] [--jobs N] [--seed N]
+"""
+import argparse
+import io
+import math
+import multiprocessing
+import random
+import time
+import numpy as np
+from Nogo import Nogo
+from gtp_connection import GtpConnection, format_point, point_to_coord
+from board_util import GoBoardUtil, BLACK, WHITE
+from benchmark_primitives import BOARD_BACKENDS
+from heuristic import load_engine_data
+
+"""
+Configuration used for the keys that are not given
+"""
+DEFAULT_CONFIG = {
+    "heuristic": 1,
+    "symmetry": 1,
+    "proof_tree": 1,
+    "timelimit": 1.0,
+    "board": "simple",
+}
+
+"""
+z value of the 95% confidence interval
+"""
+Z_95 = 1.96
+
+"""
+Latency percentiles in the report
+"""
+PERCENTILES = [50, 90, 99]
+
+def parse_config(text):
+    """ Dict of the configuration text, such as 'heuristic=0,timelimit=2' """
+    config = dict(DEFAULT_CONFIG)
+    for item in text.split(','):
+        if not item.strip():
+            continue
+        key, _, value = item.partition('=')
+        key = key.strip()
+        if key not in DEFAULT_CONFIG:
+            raise ValueError("unknown configuration key {}".format(key))
+        if key == "board":
+            if value not in BOARD_BACKENDS:
+                raise ValueError("unknown board backend {}".format(value))
+            config[key] = value
+        elif key == "timelimit":
+            config[key] = float(value)
+        else:
+            config[key] = int(value)
+    return config
+
+def make_connection(config, size):
+    con = GtpConnection(Nogo(), BOARD_BACKENDS[config["board"]](size))
+    con.outfile = io.StringIO()
+    con.heuristic_mode = bool(config["heuristic"])
+    con.symmetry_check = bool(config["symmetry"])
+    con.proof_tree.enabled = bool(config["proof_tree"])
+    con.timelimit_seconds = config["timelimit"]
+    return con
+
+class GtpError(Exception):
+    """ Error response of a GTP command """
+    pass
+
+def command(con, line):
+    """
+    Run a GTP command on con and return its response text.
+    Raises GtpError on an error response, or an illegal move.
+    """
+    con.outfile = io.StringIO()
+    con.get_cmd(line)
+    response = con.outfile.getvalue().strip()
+    if response.startswith("?"):
+        raise GtpError("{}: {}".format(line, response[1:].strip()))
+    response = response.lstrip("=").strip()
+    if response.startswith("illegal move"): # play responds with =
+        raise GtpError("{}: {}".format(line, response))
+    return response
+
+def other_side(side):
+    return "b" if side == "a" else "a"
+
+def play_game(game):
+    """
+    Play one game, in a pool process.
+    game is (index, config_a, config_b, size, random_moves, seed).
+    A plays black in even games. Returns a dict with the winner,
+    'a' or 'b', the side that forfeited if any, and the latencies,
+    nodes and search seconds of each side.
+    """
+    index, config_a, config_b, size, random_moves, seed = game
+    np.random.seed(seed)
+    rng = random.Random(seed)
+    cons = {"a": make_connection(config_a, size),
+            "b": make_connection(config_b, size)}
+    if index % 2 == 0:
+        sides = {BLACK: "a", WHITE: "b"}
+    else:
+        sides = {BLACK: "b", WHITE: "a"}
+    result = {"forfeit": None,
+              "latency": {"a": [], "b": []},
+              "nodes": {"a": 0, "b": 0},
+              "seconds": {"a": 0.0, "b": 0.0}}
+    board = cons["a"].board
+    color = BLACK
+    for _ in range(random_moves):
+        moves = GoBoardUtil.generate_legal_moves(board, color)
+        if not moves:
+            break
+        move = format_point(point_to_coord(rng.choice(moves), size))
+        for con in cons.values():
+            command(con, "play {} {}".format("bw"[color - 1], move))
+        color = GoBoardUtil.opponent(color)
+    while True:
+        side = sides[color]
+        con = cons[side]
+        start = time.perf_counter()
+        try:
+            move = command(con, "genmove {}".format("bw"[color - 1]))
+            result["latency"][side].append(time.perf_counter() - start)
+            if con.last_stats is not None:
+                result["nodes"][side] += con.last_stats.nodes
+                result["seconds"][side] += con.last_stats.seconds()
+            if move.lower() == "resign" or not move:
+                # The player to move has no legal move and loses
+                result["winner"] = other_side(side)
+                return result
+            other = cons[other_side(side)]
+            command(other, "play {} {}".format("bw"[color - 1], move))
+        except GtpError:
+            result["forfeit"] = side
+            result["winner"] = other_side(side)
+            return result
+        color = GoBoardUtil.opponent(color)
+
+def wilson_interval(wins, games, z = Z_95):
+    """ Confidence interval of the win rate, by the Wilson score """
+    if games == 0:
+        return 0.0, 1.0
+    rate = wins / games
+    denominator = 1 + z * z / games
+    center = (rate + z * z / (2 * games)) / denominator
+    margin = z * math.sqrt(rate * (1 - rate) / games
+                           + z * z / (4 * games * games)) / denominator
+    return max(center - margin, 0.0), min(center + margin, 1.0)
+
+def run(config_a, config_b, games, size, random_moves, jobs = None, seed = 0):
+    """ Play the games and return the list of their results """
+    work = [(i, config_a, config_b, size, random_moves, seed + i)
+            for i in range(games)]
+    with multiprocessing.Pool(jobs, initializer = load_engine_data) as pool:
+        return list(pool.imap_unordered(play_game, work))
+
+def print_report(results, config_a, config_b):
+    games = len(results)
+    wins = sum(1 for result in results if result["winner"] == "a")
+    low, high = wilson_interval(wins, games)
+    print("a: {}".format(config_a))
+    print("b: {}".format(config_b))
+    print("games {}  a wins {}  win rate {:.3f}  95% interval [{:.3f}, {:.3f}]"
+          .format(games, wins, wins / games if games else 0.0, low, high))
+    forfeits = {side: sum(1 for result in results
+                          if result["forfeit"] == side) for side in ("a", "b")}
+    if forfeits["a"] or forfeits["b"]:
+        print("forfeits  a {}  b {}".format(forfeits["a"], forfeits["b"]))
+    print("side  moves  " + "  ".join("p{}".format(p).rjust(7)
+                                      for p in PERCENTILES)
+          + "  nodes/sec")
+    for side in ("a", "b"):
+        latency = [t for result in results for t in result["latency"][side]]
+        nodes = sum(result["nodes"][side] for result in results)
+        seconds = sum(result["seconds"][side] for result in results)
+        if latency:
+            percentiles = np.percentile(latency, PERCENTILES)
+        else:
+            percentiles = [0.0] * len(PERCENTILES)
+        print("{:>4} {:6d}  ".format(side, len(latency))
+              + "  ".join("{:7.3f}".format(p) for p in percentiles)
+              + "  {:9.1f}".format(nodes / seconds if seconds else 0.0))
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play two engine configurations against each other")
+    parser.add_argument("--a", default="", help="first configuration")
+    parser.add_argument("--b", default="", help="second configuration")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--size", type=int, default=5)
+    parser.add_argument("--random-moves", type=int, default=2,
+                        help="random moves played at the start of each game")
+    parser.add_argument("--jobs", type=int,
+                        help="processes, default one per CPU")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    try:
+        config_a = parse_config(args.a)
+        config_b = parse_config(args.b)
+    except ValueError as e:
+        parser.error(str(e))
+    results = run(config_a, config_b, args.games, args.size,
+                  args.random_moves, args.jobs, args.seed)
+    print_report(results, config_a, config_b)
+
+if __name__ == '__main__':
+    main()
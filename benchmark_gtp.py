@@ -0,0 +1,173 @@
+"""
+benchmark_gtp.py
+
+Performance regression runner for GTP test files.
+
+Every command of the files is fed to an in-process GtpConnection.
+The response of each numbered command is checked against the following
+#?[...] expectation, and its wall time and search node count are recorded.
+Results are saved as JSON and can be compared with a stored baseline,
+flagging tests that became slower or searched more nodes than the
+threshold allows, or stopped passing.
+
+Usage:
+    python benchmark_gtp.py [gtp files] [--output FILE] [--baseline FILE]
+                            [--threshold FRACTION] [--save-baseline]
+"""
+import argparse
+import io
+import json
+import re
+import sys
+import time
+from Nogo import Nogo
+from gtp_connection import GtpConnection
+from simple_board import SimpleGoBoard
+from heuristic import load_engine_data
+
+DEFAULT_FILES = ["assignment2-public-tests.gtp", "a2-sample.gtp"]
+DEFAULT_BASELINE = "benchmark_baseline.json"
+
+"""
+Slowdowns of tests faster than this many seconds are timing noise
+"""
+MIN_SECONDS = 0.05
+
+def parse_expected(line):
+    """
+    Parse an expectation line such as '#?[w d4|w c4]' or '#? [b]'.
+    Returns the list of accepted responses, or None for other lines.
+    """
+    match = re.match(r"^#\?\s*\[(.*)\]", line)
+    if match is None:
+        return None
+    return [answer.strip().lower() for answer in match.group(1).split('|')]
+
+def parse_response(output):
+    """ Strip the '= ' or '? ' prefix and the blank line of a GTP response """
+    output = output.strip()
+    if output[:1] in ('=', '?'):
+        output = output[1:]
+    return output.strip()
+
+def run_file(filename):
+    """
+    Run all commands of filename in a fresh GtpConnection.
+    Returns a list of test results, one per numbered command.
+    """
+    con = GtpConnection(Nogo(), SimpleGoBoard(7))
+    tests = []
+    last = None
+    with open(filename) as f:
+        for line in f:
+            stripped = line.strip()
+            expected = parse_expected(stripped)
+            if expected is not None:
+                if last is not None and last["expected"] is None:
+                    last["expected"] = expected
+                    last["passed"] = last["response"].lower() in expected
+                continue
+            if not stripped or stripped[0] == '#':
+                continue
+            con.outfile = io.StringIO()
+            con.last_stats = None
+            start = time.time()
+            con.get_cmd(line)
+            seconds = time.time() - start
+            if not stripped[0].isdigit():
+                continue
+            number = re.match(r"^\d+", stripped).group()
+            stats = con.last_stats
+            last = {
+                "id": "{}:{}".format(filename, number),
+                "command": stripped[len(number):].strip(),
+                "response": parse_response(con.outfile.getvalue()),
+                "expected": None,
+                "passed": None,
+                "seconds": round(seconds, 6),
+                "nodes": stats.nodes if stats is not None else None
+            }
+            tests.append(last)
+    return tests
+
+def run(filenames):
+    results = {"tests": []}
+    start = time.time()
+    for filename in filenames:
+        results["tests"].extend(run_file(filename))
+    results["total_seconds"] = round(time.time() - start, 6)
+    results["passed"] = sum(1 for test in results["tests"] if test["passed"])
+    results["failed"] = sum(1 for test in results["tests"]
+                            if test["passed"] is False)
+    return results
+
+def compare(results, baseline, threshold):
+    """
+    Compare results with baseline results.
+    Returns a list of messages, one per regression.
+    """
+    old_tests = {test["id"]: test for test in baseline["tests"]}
+    regressions = []
+    for test in results["tests"]:
+        old = old_tests.get(test["id"])
+        if old is None:
+            continue
+        if old["passed"] and test["passed"] is False:
+            regressions.append("{}: now fails, response {} expected {}"
+                .format(test["id"], test["response"], test["expected"]))
+        limit = old["seconds"] * (1 + threshold)
+        if test["seconds"] > limit and test["seconds"] > MIN_SECONDS:
+            regressions.append("{}: {:.3f}s, baseline {:.3f}s".format(
+                test["id"], test["seconds"], old["seconds"]))
+        if old["nodes"] is not None and test["nodes"] is not None \
+           and test["nodes"] > old["nodes"] * (1 + threshold):
+            regressions.append("{}: {} nodes, baseline {} nodes".format(
+                test["id"], test["nodes"], old["nodes"]))
+    return regressions
+
+def print_results(results):
+    print("{:<40} {:>7} {:>10} {:>10}  {}".format(
+        "test", "passed", "seconds", "nodes", "response"))
+    for test in results["tests"]:
+        print("{:<40} {:>7} {:>10.3f} {:>10}  {}".format(
+            test["id"], str(test["passed"]), test["seconds"],
+            str(test["nodes"]), test["response"]))
+    print("passed {} failed {} total {:.3f}s".format(
+        results["passed"], results["failed"], results["total_seconds"]))
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the engine on GTP regression files")
+    parser.add_argument("files", nargs="*", default=DEFAULT_FILES)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown, as a fraction")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store the results as the new baseline")
+    args = parser.parse_args()
+
+    load_engine_data()
+    results = run(args.files)
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=4)
+        return
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print("No baseline {}".format(args.baseline))
+        return
+    regressions = compare(results, baseline, args.threshold)
+    for message in regressions:
+        print("REGRESSION " + message)
+    if regressions:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""
+benchmark_primitives.py
+
+Micro-benchmarks for the board, hashing and heuristic primitives that
+the solver calls millions of times.
+
+Each primitive runs on the same generated positions for board sizes
+4 to 9, with warmup runs and several timed repeats. Results are printed
+as a table of microseconds per call and can be exported as JSON or CSV.
+Every board backend in BOARD_BACKENDS is measured on the same positions,
+and the results of the primitives are checked to agree between backends.
+
+Usage:
+    python benchmark_primitives.py [--sizes 4 5 ...] [--repeat N]
+                                   [--json FILE] [--csv FILE]
+"""
+import argparse
+import csv
+import json
+import random
+import statistics
+from time import perf_counter
+from board_util import GoBoardUtil, BLACK, EMPTY
+from simple_board import SimpleGoBoard
+from transposition_table import TranspositionTable, TTUtil
+from heuristic import eye_level, vectorized_evaluate, HeuristicState
+
+"""
+Board classes to compare, by name
+"""
+BOARD_BACKENDS = {
+    "simple": SimpleGoBoard,
+}
+
+def random_moves(size, count, seed):
+    """
+    count random move sequences of legal moves, filling between 0 and
+    60 percent of the board. Returns a list of lists of (color, point).
+    """
+    rng = random.Random(seed)
+    sequences = []
+    for _ in range(count):
+        board = SimpleGoBoard(size)
+        length = rng.randint(0, int(0.6 * size * size))
+        color = BLACK
+        moves = []
+        for _ in range(length):
+            legal = GoBoardUtil.generate_legal_moves(board, color)
+            if not legal:
+                break
+            move = rng.choice(legal)
+            board.play_move(move, color)
+            moves.append((color, move))
+            color = GoBoardUtil.opponent(color)
+        sequences.append(moves)
+    return sequences
+
+def make_positions(board_class, size, sequences):
+    positions = []
+    for moves in sequences:
+        board = board_class(size)
+        for color, point in moves:
+            board.play_move(point, color)
+        positions.append(board)
+    return positions
+
+def primitive_cases(positions, size):
+    """
+    Returns a list of (name, func, calls), where func runs the primitive
+    calls times over all positions and returns the results, if any,
+    which are used to compare backends.
+    """
+    tt = TranspositionTable(size)
+    boards2d = [GoBoardUtil.get_twoD_board(board) for board in positions]
+    empties = [list(board.get_empty_points()) for board in positions]
+    stones = [[p for p in board.board_points if board.board[p] != EMPTY]
+              for board in positions]
+    legal = [[p for p in points if board.is_legal(p, board.current_player)]
+             for board, points in zip(positions, empties)]
+    hstates = [HeuristicState(board) for board in positions]
+    pairs = list(zip(positions, empties))
+
+    def is_legal():
+        return [[board.is_legal(p, board.current_player) for p in points]
+                for board, points in pairs]
+
+    def play_undo():
+        for board, points in zip(positions, legal):
+            color = board.current_player
+            for p in points:
+                board.play_move(p, color)
+                board.undo_move(p, color)
+
+    def block_of():
+        return [[int(board._block_of(p).sum()) for p in points]
+                for board, points in zip(positions, stones)]
+
+    def get_empty_points():
+        return [list(board.get_empty_points()) for board in positions]
+
+    def copy():
+        for board in positions:
+            board.copy()
+
+    def code():
+        return [tt.code(board) for board in positions]
+
+    def code_2d():
+        return [tt.code_2d(board2d) for board2d in boards2d]
+
+    def symmetries():
+        return [TTUtil.symmetries(board2d) for board2d in boards2d]
+
+    def eye_levels():
+        return [[eye_level(board, p, board.current_player) for p in points]
+                for board, points in pairs]
+
+    def evaluate():
+        return [vectorized_evaluate(board, board.current_player)[0]
+                for board in positions]
+
+    def score_moves():
+        return [list(hstate.score_moves(points, board.current_player)[0])
+                for hstate, (board, points) in zip(hstates, pairs)
+                if points]
+
+    n_empty = sum(len(points) for points in empties)
+    n_positions = len(positions)
+    return [
+        ("is_legal", is_legal, n_empty),
+        ("play_move+undo_move", play_undo, sum(len(l) for l in legal)),
+        ("_block_of", block_of, sum(len(s) for s in stones)),
+        ("get_empty_points", get_empty_points, n_positions),
+        ("copy", copy, n_positions),
+        ("TT.code", code, n_positions),
+        ("TT.code_2d", code_2d, n_positions),
+        ("TTUtil.symmetries", symmetries, n_positions),
+        ("eye_level", eye_levels, n_empty),
+        ("vectorized_evaluate", evaluate, n_positions),
+        ("HeuristicState.score_moves", score_moves, n_positions),
+    ]
+
+def measure(func, calls, warmup, repeat):
+    """
+    Time func after warmup runs. Returns per call statistics
+    in microseconds over repeat runs.
+    """
+    for _ in range(warmup):
+        func()
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        times.append((perf_counter() - start) / max(calls, 1) * 1e6)
+    return {
+        "min_us": min(times),
+        "median_us": statistics.median(times),
+        "mean_us": statistics.mean(times),
+        "stdev_us": statistics.stdev(times) if len(times) > 1 else 0.0,
+    }
+
+def comparable(result):
+    """ Results of primitives as plain values, for comparing backends """
+    if result is None:
+        return None
+    return repr(result)
+
+def run(sizes, positions_per_size, warmup, repeat, seed):
+    """
+    Returns (rows, mismatches). Each row is a dict with backend, size,
+    primitive, calls and timing statistics. mismatches lists primitives
+    whose results differ from the first backend.
+    """
+    rows = []
+    mismatches = []
+    for size in sizes:
+        sequences = random_moves(size, positions_per_size, seed + size)
+        reference = {}
+        for backend, board_class in BOARD_BACKENDS.items():
+            positions = make_positions(board_class, size, sequences)
+            for name, func, calls in primitive_cases(positions, size):
+                # The TT random numbers differ between backends
+                if not name.startswith("TT."):
+                    result = comparable(func())
+                    if name not in reference:
+                        reference[name] = result
+                    elif reference[name] != result:
+                        mismatches.append((backend, size, name))
+                row = {"backend": backend, "size": size,
+                       "primitive": name, "calls": calls}
+                row.update(measure(func, calls, warmup, repeat))
+                rows.append(row)
+    return rows, mismatches
+
+def print_table(rows):
+    print("{:<8} {:>4} {:<28} {:>8} {:>10} {:>10} {:>10}".format(
+        "backend", "size", "primitive", "calls", "min_us", "median_us",
+        "stdev_us"))
+    for row in rows:
+        print("{:<8} {:>4} {:<28} {:>8} {:>10.2f} {:>10.2f} {:>10.2f}".format(
+            row["backend"], row["size"], row["primitive"], row["calls"],
+            row["min_us"], row["median_us"], row["stdev_us"]))
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmarks of board and hashing primitives")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[4, 5, 6, 7, 8, 9])
+    parser.add_argument("--positions", type=int, default=20,
+                        help="positions per board size")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="export the results as JSON")
+    parser.add_argument("--csv", help="export the results as CSV")
+    args = parser.parse_args()
+
+    rows, mismatches = run(args.sizes, args.positions, args.warmup,
+                           args.repeat, args.seed)
+    print_table(rows)
+    for backend, size, name in mismatches:
+        print("MISMATCH {} size {}: {}".format(backend, size, name))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=4)
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+eval_cache.py
+
+LRU cache of static evaluations, keyed by the exact code of the
+stones (position_code.encode), whoever is to play.
+
+The transposition table only keeps proven results, so the evaluation
+of a position was computed again every time it was reached: by the
+evaluate command, and by every search or ponder started on it to build
+the HeuristicState that orders the moves. The cache only serves these
+root evaluations. Inside negamax the HeuristicState is updated move by
+move, so there is no evaluation to look up.
+
+Entries depend on the heuristic weights, and are dropped when the
+weights change.
+"""
+from collections import OrderedDict
+from board_util import BLACK
+from heuristic import vectorized_evaluate, weights_version
+from position_code import encode
+
+class EvaluationCache(object):
+
+    def __init__(self, max_entries = 100000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.weights_version = weights_version()
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.entries.clear()
+
+    def evaluate(self, board, color):
+        """
+        Same as vectorized_evaluate(board, color):
+        (score, bneyes, wneyes, beyes, weyes)
+        """
+        if self.weights_version != weights_version():
+            self.clear()
+            self.weights_version = weights_version()
+        key = (board.size, encode(board))
+        evaluation = self.entries.get(key)
+        if evaluation is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        else:
+            self.misses += 1
+            evaluation = vectorized_evaluate(board, BLACK)
+            self.entries[key] = evaluation
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last = False)
+        if color == BLACK:
+            return evaluation
+        return (-evaluation[0],) + evaluation[1:]
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
@@ -0,0 +1,148 @@
+"""
+gtp_batch.py
+
+Non-interactive, parallel GTP batch mode, used by Nogo.py --batch.
+
+A GTP file is split into independent segments at each boardsize and
+clear_board command. The segments run in a process pool, each with its
+own board and GtpConnection, and their responses are printed in the
+original order. Settings that survive clear_board (board size, time
+limit, komi and the engine settings) are replayed silently at the start
+of each segment.
+
+Some commands cannot be split this way: the game clock carries over
+from one game to the next, traces and profiles are written to files,
+and timers and queries of the engine settings report totals of
+everything run before. A file that uses them runs as a single segment,
+in order.
+"""
+import io
+import multiprocessing
+import re
+from sys import stdout
+from Nogo import Nogo
+from gtp_connection import GtpConnection
+from simple_board import SimpleGoBoard
+from heuristic import load_engine_data
+
+"""
+Commands that start a new independent segment
+"""
+SEGMENT_COMMANDS = ["boardsize", "clear_board"]
+
+"""
+Commands whose effect lasts across segments, replayed with their
+arguments at the start of each segment
+"""
+STICKY_COMMANDS = ["boardsize", "timelimit", "komi", "memory", "ponder",
+                   "proof_tree", "reference_check", "progress"]
+
+"""
+Commands that keep state across segments which replaying cannot restore
+"""
+SEQUENTIAL_COMMANDS = ["time_settings", "time_left", "trace", "profile",
+                       "timers"]
+
+"""
+Sticky commands that report state when used without arguments
+"""
+QUERY_COMMANDS = ["memory", "ponder", "proof_tree", "reference_check"]
+
+def command_name(line):
+    """ Name of the GTP command on line, or None for comments and blanks """
+    line = line.strip()
+    if not line or line[0] == '#':
+        return None
+    line = re.sub(r"^\d+", "", line).lstrip()
+    elements = line.split()
+    if not elements:
+        return None
+    return elements[0]
+
+def command_args(line):
+    """ Arguments of the GTP command on line """
+    line = re.sub(r"^\d+", "", line.strip()).lstrip()
+    return line.split()[1:]
+
+def is_sequential(name, args):
+    """ The command cannot run in a segment of its own """
+    if name in SEQUENTIAL_COMMANDS:
+        return True
+    return name in QUERY_COMMANDS and (not args or args[0].lower() == "show")
+
+def sticky_key(name, args):
+    """ A later sticky command with the same key replaces the earlier one """
+    if name == "memory" and args: # memory limit and memory trace
+        return (name, args[0].lower())
+    return (name,)
+
+def split_segments(lines):
+    """
+    Split GTP lines into segments.
+    Returns a list of (setup, commands): setup holds the sticky commands
+    in effect at the start of the segment, commands the segment's lines.
+    Lines after quit are dropped. If a line uses a command that cannot
+    be split, all lines form a single segment.
+    """
+    commands = []
+    for line in lines:
+        name = command_name(line)
+        if name is None:
+            continue
+        commands.append(line)
+        if name == "quit":
+            break
+    if any(is_sequential(command_name(line), command_args(line))
+           for line in commands):
+        return [([], commands)]
+    segments = []
+    sticky = {}
+    setup = []
+    segment = []
+    for line in commands:
+        name = command_name(line)
+        args = command_args(line)
+        if name in SEGMENT_COMMANDS and segment:
+            segments.append((setup, segment))
+            setup = list(sticky.values())
+            segment = []
+        segment.append(line)
+        if name in STICKY_COMMANDS:
+            sticky[sticky_key(name, args)] = \
+                re.sub(r"^\d+", "", line.strip()).lstrip() + '\n'
+    if segment:
+        segments.append((setup, segment))
+    return segments
+
+def run_segment(segment):
+    """
+    Run one segment in a fresh GtpConnection.
+    Returns (output, quit), where output holds all responses and quit
+    tells whether the segment ended with a quit command.
+    """
+    setup, commands = segment
+    con = GtpConnection(Nogo(), SimpleGoBoard(7))
+    con.outfile = io.StringIO()
+    for line in setup:
+        con.get_cmd(line)
+    con.outfile = io.StringIO()
+    try:
+        for line in commands:
+            con.get_cmd(line)
+    except SystemExit:
+        return con.outfile.getvalue(), True
+    return con.outfile.getvalue(), False
+
+def run_batch(filename, jobs = None, out = stdout):
+    """
+    Run all segments of filename in a pool of jobs processes
+    (default: one per CPU) and write the responses to out in order.
+    """
+    with open(filename) as f:
+        segments = split_segments(f.readlines())
+    with multiprocessing.Pool(jobs, initializer = load_engine_data) as pool:
+        for output, quit in pool.imap(run_segment, segments):
+            out.write(output)
+            if quit:
+                break
+    out.flush()
@@ -13,8 +13,29 @@ from board_util import GoBoardUtil, BLACK, WHITE, EMPTY, BORDER, PASS, \
 import numpy as np
 import re
 import signal
+import time
 from transposition_table import TranspositionTable, TTUtil
-from heuristic import statisticaly_evaluate
+from heuristic import vectorized_evaluate, HeuristicState
+from patterns import LEGAL, policy_scores
+from eval_cache import EvaluationCache
+from search_stats import SearchStats
+from profiling import Profiler, FunctionTimers
+from pondering import Ponderer
+from legality_cache import LegalityCache
+from symmetry import unique_moves
+from position_code import position_key
+from memory_stats import MemoryMonitor
+from time_manager import TimeManager
+from progress import ProgressReporter, MODES as PROGRESS_MODES
+from search_trace import TraceWriter, DEFAULT_MAX_DEPTH
+from proof_tree import ProofTree
+from reference_check import ReferenceChecker
+
+"""
+negamax searches only one of each class of symmetric moves
+in nodes shallower than this depth
+"""
+SYMMETRY_PRUNE_DEPTH = 4
 
 class GtpConnection():
 
@@ -32,6 +53,24 @@ class GtpConnection():
         self._debug_mode = debug_mode
         self.go_engine = go_engine
         self.board = board
+        self.outfile = stdout # stream for GTP responses
+        self.timelimit_seconds = TIMELIMIT # for genmove and solve
+        self.time_manager = TimeManager() # game clock for genmove
+        self.heuristic_mode = True # negamax options for solve and genmove
+        self.symmetry_check = True
+        self.tracer = None # TraceWriter of the trace command
+        self.progress = ProgressReporter()
+        self.reference_checker = None # sampled checks of searched positions
+        self.last_search = None # (board, solution) to check after responding
+        self.last_stats = None # SearchStats of the last solve or genmove
+        self.profiler = Profiler()
+        self.timers = FunctionTimers()
+        self.tt = None # kept across searches, see get_tt
+        self.eval_cache = EvaluationCache() # root evaluations
+        self.proof_tree = ProofTree() # winning moves kept across the game
+        self.memory = MemoryMonitor()
+        self.legality_cache = LegalityCache()
+        self.ponderer = Ponderer(self)
         self.commands = {
             "protocol_version": self.protocol_version_cmd,
             "quit": self.quit_cmd,
@@ -50,6 +89,17 @@ class GtpConnection():
             "evaluate": self.evaluate,
             "checkhash": self.check_hash,
             "timelimit": self.timelimit,
+            "time_settings": self.time_settings_cmd,
+            "time_left": self.time_left_cmd,
+            "solve_stats": self.solve_stats_cmd,
+            "profile": self.profile_cmd,
+            "timers": self.timers_cmd,
+            "ponder": self.ponder_cmd,
+            "memory": self.memory_cmd,
+            "trace": self.trace_cmd,
+            "progress": self.progress_cmd,
+            "proof_tree": self.proof_tree_cmd,
+            "reference_check": self.reference_check_cmd,
             "gogui-rules_game_id": self.gogui_rules_game_id_cmd,
             "gogui-rules_board_size": self.gogui_rules_board_size_cmd,
             "gogui-rules_legal_moves": self.gogui_rules_legal_moves_cmd,
@@ -69,47 +119,68 @@ class GtpConnection():
             "genmove": (1, 'Usage: genmove {w,b}'),
             "play": (2, 'Usage: play {b,w} MOVE'),
             "legal_moves": (1, 'Usage: legal_moves {w,b}'),
-            "timelimit": (1, 'Usage: timelimit INT')
+            "timelimit": (1, 'Usage: timelimit INT'),
+            "time_settings": (3, 'Usage: time_settings MAIN_TIME '
+                                 'BYO_YOMI_TIME BYO_YOMI_STONES'),
+            "time_left": (3, 'Usage: time_left {w,b} TIME STONES')
         }
 
     def write(self, data):
-        stdout.write(data)
+        self.outfile.write(data)
 
     def flush(self):
-        stdout.flush()
+        self.outfile.flush()
 
     def start_connection(self):
         """
         Start a GTP connection.
         This function continuously monitors standard input for commands.
+        Input is read in a background thread, so that the engine can
+        ponder while waiting for a command.
         """
-        line = stdin.readline()
+        self.ponderer.start_reader(stdin)
+        line = self.ponderer.next_line()
         while line:
             self.get_cmd(line)
-            line = stdin.readline()
+            line = self.ponderer.next_line()
 
-    def get_cmd(self, command):
+    def parse_cmd(self, command):
         """
-        Parse command string and execute it
+        Parse command string.
+        Returns (command_name, args), or None for blank lines and comments
         """
         if len(command.strip(' \r\t')) == 0:
-            return
+            return None
         if command[0] == '#':
-            return
+            return None
         # Strip leading numbers from regression tests
         if command[0].isdigit():
             command = re.sub("^\d+", "", command).lstrip()
 
         elements = command.split()
         if not elements:
+            return None
+        return elements[0], elements[1:]
+
+    def get_cmd(self, command):
+        """
+        Parse command string and execute it
+        """
+        parsed = self.parse_cmd(command)
+        if parsed is None:
             return
-        command_name = elements[0]
-        args = elements[1:]
+        command_name, args = parsed
         if self.has_arg_error(command_name, len(args)):
             return
         if command_name in self.commands:
             try:
-                self.commands[command_name](args)
+                if self.profiler.active(command_name):
+                    self.profiler.run(command_name,
+                                      self.commands[command_name], args)
+                    self.debug_msg("Profile written to {}\n".format(
+                        self.profiler.last_file))
+                else:
+                    self.commands[command_name](args)
             except Exception as e:
                 self.debug_msg("Error executing command {}\n".format(str(e)))
                 self.debug_msg("Stack Trace:\n{}\n".
@@ -118,7 +189,6 @@ class GtpConnection():
         else:
             self.debug_msg("Unknown command: {}\n".format(command_name))
             self.error('Unknown command')
-            stdout.flush()
 
     def has_arg_error(self, cmd, argnum):
         """
@@ -137,20 +207,22 @@ class GtpConnection():
             stderr.flush()
 
     def error(self, error_msg):
-        """ Send error msg to stdout """
-        stdout.write('? {}\n\n'.format(error_msg))
-        stdout.flush()
+        """ Send error msg to the output stream """
+        self.write('? {}\n\n'.format(error_msg))
+        self.flush()
 
     def respond(self, response=''):
-        """ Send response to stdout """
-        stdout.write('= {}\n\n'.format(response))
-        stdout.flush()
+        """ Send response to the output stream """
+        self.write('= {}\n\n'.format(response))
+        self.flush()
 
     def reset(self, size):
         """
         Reset the board to empty board of given size
         """
         self.board.reset(size)
+        self.tt = None
+        self.proof_tree.clear()
 
     def board2d(self):
         return str(GoBoardUtil.get_twoD_board(self.board))
@@ -213,20 +285,26 @@ class GtpConnection():
         """
         board_color = args[0].lower()
         color = color_to_int(board_color)
-        moves = GoBoardUtil.generate_legal_moves(self.board, color)
+        moves = self.legality_cache.legal_moves(self.board, color)
+        self.respond(self.format_moves(moves))
+
+    def format_moves(self, moves):
+        """ Sorted GTP coordinates of moves, separated by spaces """
         gtp_moves = []
         for move in moves:
             coords = point_to_coord(move, self.board.size)
             gtp_moves.append(format_point(coords))
-        sorted_moves = ' '.join(sorted(gtp_moves))
-        self.respond(sorted_moves)
+        return ' '.join(sorted(gtp_moves))
 
     def evaluate(self, args):
         """
         Calculates how advantageous the current board is for the current
-        player and returns an integer score (higher is better)
+        player and returns an integer score (higher is better), followed by
+        the near-eyes and eyes of black and white, as statisticaly_evaluate
         """
-        score = statisticaly_evaluate(self.board, self.board.current_player)
+        evaluation = self.cached_evaluate(self.board)
+        score = (evaluation[0],) + tuple([int(point) for point in points]
+                                         for points in evaluation[1:])
         current = "black" if self.board.current_player == BLACK else "white"
         self.respond("{} for {}".format(score, current))
 
@@ -240,43 +318,368 @@ class GtpConnection():
         print("1D code: {}".format(state_code))
         twoD_board = GoBoardUtil.get_twoD_board(self.board)
         print(twoD_board)
-        twoD_code = tt.code_2d(twoD_board)
+        twoD_code = tt.code_2d(twoD_board, self.board.current_player)
         print("2D code: {}".format(twoD_code))
+        print("Exact code: {}".format(position_key(self.board).hex()))
 
     def timelimit(self, args):
         """
         Sets the maximum time to allow for genmove and solve commands
         """
-        global TIMELIMIT
-        TIMELIMIT = int(args[0])
+        self.timelimit_seconds = int(args[0])
+        self.respond()
+
+    def time_settings_cmd(self, args):
+        """
+        time_settings main_time byo_yomi_time byo_yomi_stones
+        Use a game clock for genmove instead of the fixed time limit
+        """
+        try:
+            self.time_manager.set_time_settings(
+                float(args[0]), float(args[1]), int(args[2]))
+        except ValueError:
+            self.error(self.argmap["time_settings"][1])
+            return
+        self.respond()
+
+    def time_left_cmd(self, args):
+        """
+        time_left color time stones
+        Time left on the clock of color, stones is 0 in main time
+        """
+        color = args[0].lower()
+        if color not in ("b", "w"):
+            self.error(self.argmap["time_left"][1])
+            return
+        try:
+            self.time_manager.set_time_left(
+                color_to_int(color), float(args[1]), int(args[2]))
+        except ValueError:
+            self.error(self.argmap["time_left"][1])
+            return
+        self.respond()
+
+    def get_tt(self):
+        """
+        The transposition table is kept across searches, so that results
+        of earlier searches and of pondering are reused.
+        A new one is made when the board is reset.
+        Its size is bounded by the memory limit, if any.
+        """
+        if self.tt is None or self.tt.board_size != self.board.size:
+            self.tt = TranspositionTable(self.board.size)
+        self.memory.apply_limit(self.tt)
+        return self.tt
+
+    def cached_evaluate(self, board, stats = None):
+        """
+        vectorized_evaluate of board for the player to move, through the
+        evaluation cache. Lookups are counted in stats, a SearchStats.
+        """
+        hits = self.eval_cache.hits
+        evaluation = self.eval_cache.evaluate(board, board.current_player)
+        if stats is not None:
+            if self.eval_cache.hits > hits:
+                stats.eval_cache_hits += 1
+            else:
+                stats.eval_cache_misses += 1
+        return evaluation
+
+    def heuristic_state(self, board, stats = None):
+        """ HeuristicState for a search of board, None if heuristics are off """
+        if not self.heuristic_mode:
+            return None
+        score = self.cached_evaluate(board, stats)[0]
+        if board.current_player == WHITE:
+            score = -score
+        return HeuristicState(board, score)
+
+    def memory_cmd(self, args):
+        """
+        memory {show,limit MB,trace on,trace off}
+        Show the memory used by the process and the transposition table,
+        set the memory ceiling (0 for none), or switch allocation
+        tracing with tracemalloc on or off.
+        """
+        usage = "Usage: memory {show,limit MB,trace on,trace off}"
+        action = args[0].lower() if args else "show"
+        if action == "show":
+            self.respond('\n' + self.memory.report(self.tt))
+            return
+        if len(args) != 2:
+            self.error(usage)
+            return
+        if action == "limit":
+            try:
+                self.memory.set_limit(float(args[1]))
+            except ValueError:
+                self.error(usage)
+                return
+            if self.tt is not None:
+                self.memory.apply_limit(self.tt)
+        elif action == "trace" and args[1].lower() == "on":
+            self.memory.start_trace()
+        elif action == "trace" and args[1].lower() == "off":
+            self.memory.stop_trace()
+        else:
+            self.error(usage)
+            return
+        self.respond()
+
+    def ponder_cmd(self, args):
+        """
+        ponder {on,off}
+        Search the current position while waiting for the next command.
+        Without arguments, report the mode and the last ponder search.
+        """
+        if not args:
+            mode = "on" if self.ponderer.enabled else "off"
+            stats = self.ponderer.last_stats
+            if stats is None:
+                self.respond(mode)
+            else:
+                self.respond("{} nodes {} seconds {:.3f}".format(
+                    mode, stats.nodes, stats.seconds()))
+            return
+        if args[0].lower() not in ("on", "off"):
+            self.error("Usage: ponder {on,off}")
+            return
+        self.ponderer.enabled = args[0].lower() == "on"
+        self.respond()
+
+    def start_stats(self):
+        """ Create the SearchStats for a new search """
+        self.last_stats = SearchStats()
+        self.last_stats.start()
+        return self.last_stats
+
+    def solve_stats_cmd(self, args):
+        """
+        Report the search statistics of the last solve or genmove.
+        With argument json, respond with a single line of JSON.
+        """
+        if self.last_stats is None:
+            self.error("no search yet")
+            return
+        if args and args[0].lower() == "json":
+            self.respond(self.last_stats.to_json())
+        else:
+            self.respond('\n' + str(self.last_stats))
+
+    def profile_cmd(self, args):
+        """
+        profile {off,cprofile,sample} [DIRECTORY]
+        Profile the following solve, genmove and evaluate commands
+        with cProfile or with the stack sampler.
+        Without arguments, report the current mode and last profile file.
+        """
+        if not args:
+            self.respond("{} {}".format(self.profiler.mode or "off",
+                                        self.profiler.last_file or ""))
+            return
+        mode = args[0].lower()
+        if mode == "off":
+            self.profiler.mode = None
+        elif mode in Profiler.MODES:
+            self.profiler.mode = mode
+        else:
+            self.error("Usage: profile {off,cprofile,sample} [DIRECTORY]")
+            return
+        if len(args) > 1:
+            self.profiler.directory = args[1]
+        self.respond()
+
+    def timers_cmd(self, args):
+        """
+        timers {on,off,reset,show}
+        Switch timing of the hot board functions on or off,
+        clear the totals, or show them.
+        """
+        action = args[0].lower() if args else "show"
+        if action == "on":
+            self.timers.enable()
+        elif action == "off":
+            self.timers.disable()
+        elif action == "reset":
+            self.timers.reset()
+        elif action == "show":
+            self.respond('\n' + self.timers.report())
+            return
+        else:
+            self.error("Usage: timers {on,off,reset,show}")
+            return
+        self.respond()
+
+    def proof_tree_cmd(self, args):
+        """
+        proof_tree {on,off}
+        Keep the winning moves of proven wins across the game, so that
+        genmove in a won game is a lookup.
+        Without arguments, report the mode and the size of the tree.
+        """
+        if not args:
+            self.respond("{} {} positions {} hits".format(
+                "on" if self.proof_tree.enabled else "off",
+                len(self.proof_tree.moves), self.proof_tree.hits))
+            return
+        if args[0].lower() not in ("on", "off"):
+            self.error("Usage: proof_tree {on,off}")
+            return
+        self.proof_tree.enabled = args[0].lower() == "on"
+        if not self.proof_tree.enabled:
+            self.proof_tree.clear()
+        self.respond()
+
+    def reference_check_cmd(self, args):
+        """
+        reference_check RATE
+        Check the fraction RATE of the searched positions and results
+        against the reference implementations, 0 to stop.
+        Without arguments, report the checks done so far.
+        """
+        if not args:
+            checker = self.reference_checker
+            if checker is None:
+                self.respond("off")
+            else:
+                self.respond("rate {} checks {} mismatches {} skipped {}"
+                             .format(checker.rate, checker.checks,
+                                     checker.mismatches, checker.skipped))
+            return
+        try:
+            rate = float(args[0])
+        except ValueError:
+            self.error("Usage: reference_check RATE")
+            return
+        self.reference_checker = ReferenceChecker(rate) if rate > 0 else None
+        self.last_search = None
+        self.respond()
+
+    def progress_cmd(self, args):
+        """
+        progress {off,stderr,gfx} [SECONDS]
+        Report the progress of searches every SECONDS on stderr,
+        as text or as gogui-gfx blocks.
+        """
+        if not args:
+            self.respond("{} {}".format(self.progress.mode or "off",
+                                        self.progress.interval))
+            return
+        mode = args[0].lower()
+        if mode != "off" and mode not in PROGRESS_MODES:
+            self.error("Usage: progress {off,stderr,gfx} [SECONDS]")
+            return
+        if len(args) > 1:
+            try:
+                interval = float(args[1])
+            except ValueError:
+                interval = 0
+            if interval <= 0:
+                self.error("Usage: progress {off,stderr,gfx} [SECONDS]")
+                return
+            self.progress.interval = interval
+        self.progress.mode = None if mode == "off" else mode
         self.respond()
 
+    def trace_cmd(self, args):
+        """
+        trace FILE [MAX_DEPTH] | trace off
+        Write a binary trace of the moves searched below MAX_DEPTH
+        by the following searches to FILE, see search_trace.py.
+        """
+        if not args:
+            if self.tracer is None:
+                self.respond("off")
+            else:
+                self.respond("{} {} records".format(self.tracer.filename,
+                                                    self.tracer.records))
+            return
+        if self.tracer is not None:
+            self.tracer.close()
+            self.tracer = None
+        if args[0].lower() == "off":
+            self.respond()
+            return
+        try:
+            max_depth = int(args[1]) if len(args) > 1 else DEFAULT_MAX_DEPTH
+            self.tracer = TraceWriter(args[0], self.board.size, max_depth)
+        except (ValueError, OSError) as e:
+            self.error("Cannot trace: {}".format(e))
+            return
+        self.respond()
+
+    def search(self, seconds = None):
+        """
+        Solve a copy of the current board within seconds,
+        by default the time limit.
+        Returns (win, move) for the current player, or None on timeout.
+        The search counters are kept in self.last_stats.
+        """
+        if seconds is None:
+            seconds = self.timelimit_seconds
+        stats = self.start_stats()
+        signal.signal(signal.SIGALRM, timeout_handler)
+        signal.setitimer(signal.ITIMER_REAL, seconds)
+        try:
+            tt = self.get_tt()
+            board_copy = self.board.copy()
+            hstate = self.heuristic_state(board_copy, stats)
+            self.progress.start(stats, tt, self.board)
+            solution = negamax(board_copy, tt, hstate = hstate,
+                               HeuristicMode = self.heuristic_mode,
+                               SymmetryCheck = self.symmetry_check,
+                               stats = stats, tracer = self.tracer)
+        except TimeoutError:
+            solution = None
+        finally:
+            # Never leave the timer armed for a later command
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            self.progress.stop()
+            stats.stop()
+        if self.tracer is not None:
+            self.tracer.flush()
+        if self.reference_checker is not None:
+            self.last_search = (self.board.copy(), solution)
+        return solution
+
+    def check_last_search(self):
+        """
+        Run the sampled reference check of the last search. Called after
+        the response is written, so that it is not part of the search time.
+        """
+        if self.last_search is not None:
+            board, solution = self.last_search
+            self.last_search = None
+            self.reference_checker.maybe_check(board, solution)
+
     def solve(self, args):
         """
         Responds "= winner move" with winning color as winner
         Only includes move if winner == current player
         """
-        try:
+        self.respond_solve(self.search())
+        self.check_last_search()
+
+    def respond_solve(self, solution):
+        """
+        Respond to solve, given the result of search
+        """
+        if solution is None:
+            result = "unknown"
+        else:
             color = self.board.current_player
-            global TIMELIMIT
-            signal.signal(signal.SIGALRM, timeout_handler)
-            signal.alarm(int(TIMELIMIT))
-            tt = TranspositionTable(self.board.size)
-            board_copy = self.board.copy()
-            solution = negamax(board_copy, tt)
-            signal.alarm(0)
             win, move = solution
             if not win:
                 color = GoBoardUtil.opponent(color)
             winner = "b" if color == BLACK else "w"
             if move == 0:
-                self.respond("{}".format(winner))
+                result = "{}".format(winner)
             else:
                 move = point_to_coord(move, self.board.size)
                 move = format_point(move).lower()
-                self.respond("{} {}".format(winner, move))
-        except TimeoutError:
-            self.respond("unknown")
+                result = "{} {}".format(winner, move)
+        self.last_stats.result = result
+        self.respond(result)
 
     def play_cmd(self, args):
         """
@@ -317,30 +720,51 @@ class GtpConnection():
         """
         Generate a move for the color args[0] in {'b', 'w'}, for the game of gomoku.
         """
-        global TIMELIMIT
         board_color = args[0].lower()
         color = color_to_int(board_color)
         if self.go_engine.get_move(self.board, color) is None:
             self.respond("resign")
             return
+        start = time.time()
+        if self.time_manager.active():
+            seconds = self.time_manager.budget(self.board, color)
         else:
-            try:
-                signal.signal(signal.SIGALRM, timeout_handler)
-                signal.alarm(int(TIMELIMIT))
-                tt = TranspositionTable(self.board.size)
-                board_copy = self.board.copy()
-                solution = negamax(board_copy, tt)
-                signal.alarm(0)
-                win, move = solution
-                if not win:
-                    self.genmove_random(color)
-                else:
-                    self.board.play_move(move, color)
-                    move_coord = point_to_coord(move, self.board.size)
-                    move_as_string = format_point(move_coord)
-                    self.respond(move_as_string)
-            except TimeoutError:
-                self.genmove_random(color)
+            seconds = self.timelimit_seconds
+        # The proof tree is extended within the same budget as the search
+        deadline = start + seconds
+        move = self.proof_tree.lookup(self.board)
+        if move is not None and self.board.current_player == color \
+           and self.board.is_legal(move, color):
+            self.start_stats().stop()
+            self.respond_genmove(color, (True, move))
+            self.proof_tree.extend(self.board, self.get_tt(), deadline)
+        else:
+            self.respond_genmove(color, self.search(seconds))
+            if self.last_stats.result == "win":
+                self.proof_tree.extend(self.board, self.get_tt(), deadline)
+        if self.time_manager.active():
+            self.time_manager.used(color, time.time() - start)
+        self.check_last_search()
+
+    def respond_genmove(self, color, solution):
+        """
+        Play and respond with the winning move of solution,
+        or a random move if there is none
+        """
+        if solution is None:
+            self.last_stats.result = "unknown"
+            self.genmove_random(color)
+            return
+        win, move = solution
+        if not win:
+            self.last_stats.result = "loss"
+            self.genmove_random(color)
+        else:
+            self.last_stats.result = "win"
+            self.board.play_move(move, color)
+            move_coord = point_to_coord(move, self.board.size)
+            move_as_string = format_point(move_coord)
+            self.respond(move_as_string)
 
     def genmove_random(self, color):
         move = self.go_engine.get_move(self.board, color)
@@ -356,34 +780,10 @@ class GtpConnection():
     def gogui_rules_board_size_cmd(self, args):
         self.respond(str(self.board.size))
 
-    def legal_moves_cmd(self, args):
-        """
-            List legal moves for color args[0] in {'b','w'}
-            """
-        board_color = args[0].lower()
-        color = color_to_int(board_color)
-        moves = GoBoardUtil.generate_legal_moves(self.board, color)
-        gtp_moves = []
-        for move in moves:
-            coords = point_to_coord(move, self.board.size)
-            gtp_moves.append(format_point(coords))
-        sorted_moves = ' '.join(sorted(gtp_moves))
-        self.respond(sorted_moves)
-
     def gogui_rules_legal_moves_cmd(self, args):
-        empties = self.board.get_empty_points()
         color = self.board.current_player
-        legal_moves = []
-        for move in empties:
-            if self.board.is_legal(move, color):
-                legal_moves.append(move)
-
-        gtp_moves = []
-        for move in legal_moves:
-            coords = point_to_coord(move, self.board.size)
-            gtp_moves.append(format_point(coords))
-        sorted_moves = ' '.join(sorted(gtp_moves))
-        self.respond(sorted_moves)
+        moves = self.legality_cache.legal_moves(self.board, color)
+        self.respond(self.format_moves(moves))
 
     def gogui_rules_side_to_move_cmd(self, args):
         color = "black" if self.board.current_player == BLACK else "white"
@@ -408,13 +808,8 @@ class GtpConnection():
         self.respond(str)
 
     def gogui_rules_final_result_cmd(self, args):
-        empties = self.board.get_empty_points()
         color = self.board.current_player
-        legal_moves = []
-        for move in empties:
-            if self.board.is_legal(move, color):
-                legal_moves.append(move)
-        if not legal_moves:
+        if self.legality_cache.is_terminal(self.board, color):
             result = "black" if self.board.current_player == WHITE else "white"
         else:
             result = "unknown"
@@ -427,11 +822,34 @@ class GtpConnection():
                      "pstring/Board Size/gogui-rules_board_size\n"
                      "pstring/Rules GameID/gogui-rules_game_id\n"
                      "pstring/Show Board/gogui-rules_board\n"
+                     "string/Solve Stats/solve_stats\n"
                      )
 
 
-def negamax(board, tt, bbl = [], wbl = [], bneyes = [], wneyes = [], beyes = [], weyes = [],
-            weight = None, HeuristicMode = True, SymmetryCheck = True):
+def transposition_cutoff(tt, state_code, moves, color):
+    """
+    Enhanced transposition cutoff: probe the transposition table for the
+    children of the position with code state_code, before searching any.
+    Returns a move of color whose child is proven lost for the opponent,
+    or None. Such a move is legal: in NoGo nothing is ever captured, so
+    the legality of a move only depends on the position it leads to,
+    which the search reached through legal moves.
+    """
+    codes = tt.child_codes(state_code, moves, color)
+    for move, code in zip(moves.tolist(), codes.tolist()):
+        ret = tt.lookup(code)
+        if ret is not None and not ret[0]:
+            return move
+    return None
+
+def store_result(tt, stats, state_code, result):
+    """ Store result in tt, counting the store in stats """
+    stats.tt_stores += 1
+    return tt.store(state_code, result)
+
+def negamax(board, tt, bbl = None, wbl = None, hstate = None,
+            HeuristicMode = True, SymmetryCheck = True, stats = None,
+            depth = 0, tracer = None):
     """
     Simple boolean negamax implementation with transposition table optimization
 
@@ -439,22 +857,42 @@ def negamax(board, tt, bbl = [], wbl = [], bneyes = [], wneyes = [], beyes = [],
     Else returns (false, 0) if current player will lose against perfect play
     Does not prune symmetrically or implement heuristics, simple DFS only.
     Runs full tree instead of using hash table to reduce to a (much smaller) DAG
+    In HeuristicMode, hstate is a HeuristicState for board which is updated
+    on every play and undo, and used to order the moves.
+    Search counters are collected in stats, a SearchStats.
+    Moves searched below tracer.max_depth are written to tracer,
+    a TraceWriter, if given.
+    With SymmetryCheck, symmetric positions are looked up in the
+    transposition table, and symmetric moves are pruned near the root.
     """
+    if bbl is None:
+        bbl = []
+    if wbl is None:
+        wbl = []
+    if stats is None:
+        stats = SearchStats()
+    stats.nodes += 1
+    if depth > stats.max_depth:
+        stats.max_depth = depth
     # Check transposition table to see whether we have encountered this position
     state_code = tt.code(board)
     ret = tt.lookup(state_code)
     if ret is not None: 
+        stats.tt_hits += 1
         return ret
+    stats.tt_misses += 1
+    current_color = board.current_player
     if SymmetryCheck is True:
         # Check symmetrical equivalents of current board position
         twoD_board = GoBoardUtil.get_twoD_board(board)
         symmetries = TTUtil.symmetries(twoD_board)
         for tdb in symmetries:
-            code = tt.code_2d(tdb)
+            code = tt.code_2d(tdb, current_color)
             ret = tt.lookup(code)
-            if ret is not None:
+            # The move of a symmetric position is not a move of the root
+            if ret is not None and (depth > 0 or not ret[0]):
+                stats.symmetry_hits += 1
                 return ret
-    current_color = board.current_player
     empty_points = list(board.get_empty_points())
     if current_color is BLACK: # Remove known illegal moves
         for pt in bbl:
@@ -466,48 +904,109 @@ def negamax(board, tt, bbl = [], wbl = [], bneyes = [], wneyes = [], beyes = [],
                 empty_points.remove(pt)
   
     if len(empty_points) == 0:
-        return tt.store(state_code, (False, 0))
+        return store_result(tt, stats, state_code, (False, 0))
+
+    if SymmetryCheck is True and depth < SYMMETRY_PRUNE_DEPTH:
+        # Symmetric moves lead to equivalent positions, search one of each
+        unique = unique_moves(board, np.array(empty_points))
+        if unique is not None:
+            stats.symmetry_pruned += len(empty_points) - int(unique.sum())
+            empty_points = [pt for pt, keep in zip(empty_points, unique)
+                            if keep]
 
     if HeuristicMode is True:
-        if weight is None:
-            [weight, bneyes, wneyes, beyes, weyes] = statisticaly_evaluate(board, current_color)
-        ordered_moves = []
-        for move in empty_points: # Heuristic check to order moves
-            board.fast_play_move(move, current_color)
-            (newweight, newbneyes, newwneyes, newbeyes, newweyes) = statisticaly_evaluate(board, current_color, move, 
-                                                    weight, list(bneyes), list(wneyes), list(beyes), list(weyes))
-            board.undo_move(move, current_color)
-            ordered_moves.append((move, newweight, newbneyes, newwneyes, newbeyes, newweyes))
-        ordered_moves.sort(key=lambda weighted: -weighted[1])
-
-        for (move, nw, bne, wne, be, we) in ordered_moves:
+        if hstate is None:
+            hstate = HeuristicState(board)
+        moves = np.array(empty_points)
+        scores, deltas, in_eye = hstate.score_moves(moves, current_color)
+        hints = hstate.patterns.legality_hints(moves, current_color)
+        stats.illegal_moves += int(in_eye.sum())
+        for move in moves[in_eye]: # Always illegal in NoGo
+            if current_color is BLACK:
+                bbl.append(move)
+            if current_color is WHITE:
+                wbl.append(move)
+        policy = policy_scores(hstate.patterns.codes[moves], current_color)
+        if policy is not None: # learned pattern weights, see train_policy.py
+            scores = scores + policy
+        # Heuristic move ordering, best score first
+        order = np.argsort(-scores, kind = 'stable')
+        order = order[~in_eye[order]]
+        move = transposition_cutoff(tt, state_code, moves[order],
+                                    current_color)
+        if move is not None:
+            stats.etc_cutoffs += 1
+            return store_result(tt, stats, state_code, (True, move))
+        for index, (move, delta, hint) in enumerate(zip(
+                moves[order].tolist(), deltas[order].tolist(),
+                hints[order].tolist())):
             try: # Illegal moves will raise ValueError
-                board.play_move(move, current_color)
-                isWin = not negamax(board, tt, list(bbl), list(wbl), bne, wne, be, we, -nw)[0]
+                if hint == LEGAL: # No capture or suicide check needed
+                    board.fast_play_move(move, current_color)
+                else:
+                    board.play_move(move, current_color)
+                if depth == 0:
+                    stats.root_move = move
+                hstate.play(move, current_color, delta)
+                if tracer is not None and depth < tracer.max_depth:
+                    nodes, start = stats.nodes, time.perf_counter()
+                isWin = not negamax(board, tt, list(bbl), list(wbl), hstate,
+                                    stats = stats, depth = depth + 1,
+                                    tracer = tracer)[0]
+                if tracer is not None and depth < tracer.max_depth:
+                    tracer.record(state_code, depth, move, isWin,
+                                  stats.nodes - nodes,
+                                  time.perf_counter() - start)
                 board.undo_move(move, current_color)
+                hstate.undo(move, current_color)
                 if isWin:
-                    return tt.store(state_code, (True, move))
+                    stats.cutoff(index)
+                    return store_result(tt, stats, state_code, (True, move))
+                if depth == 0:
+                    stats.refuted.append(move)
             except ValueError: # Add illegal move to bl so we don't try it again
+                stats.illegal_moves += 1
                 if current_color is BLACK:
                     bbl.append(move)
                 if current_color is WHITE:
                     wbl.append(move)
 
     else:
-        for move in empty_points:
+        move = transposition_cutoff(tt, state_code, np.array(empty_points),
+                                    current_color)
+        if move is not None:
+            stats.etc_cutoffs += 1
+            return store_result(tt, stats, state_code, (True, move))
+        for index, move in enumerate(empty_points):
             try: # Illegal moves will raise ValueError
                 board.play_move(move, current_color)
-                isWin = not negamax(board, tt, list(bbl), list(wbl))[0]
+                if depth == 0:
+                    stats.root_move = move
+                if tracer is not None and depth < tracer.max_depth:
+                    nodes, start = stats.nodes, time.perf_counter()
+                isWin = not negamax(board, tt, list(bbl), list(wbl),
+                                    HeuristicMode = False,
+                                    SymmetryCheck = SymmetryCheck,
+                                    stats = stats, depth = depth + 1,
+                                    tracer = tracer)[0]
+                if tracer is not None and depth < tracer.max_depth:
+                    tracer.record(state_code, depth, int(move), isWin,
+                                  stats.nodes - nodes,
+                                  time.perf_counter() - start)
                 board.undo_move(move, current_color)
                 if isWin:
-                    return tt.store(state_code, (True, move))
+                    stats.cutoff(index)
+                    return store_result(tt, stats, state_code, (True, move))
+                if depth == 0:
+                    stats.refuted.append(move)
             except ValueError: # Add illegal move to bl so we don't try it again
+                stats.illegal_moves += 1
                 if current_color is BLACK:
                     bbl.append(move)
                 if current_color is WHITE:
                     wbl.append(move)
     
-    return tt.store(state_code, (False, 0))
+    return store_result(tt, stats, state_code, (False, 0))
 
 
 def timeout_handler(signum, frame):
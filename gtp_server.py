@@ -0,0 +1,213 @@
+"""
+gtp_server.py
+
+Asyncio GTP server for playing many games at once from one process.
+
+Every client connection gets its own SimpleGoBoard and GtpConnection.
+Cheap commands such as play or legal_moves run directly in the event
+loop. solve and genmove searches run in a process pool shared by all
+sessions, so a long search never blocks the other sessions. Proven
+results are kept in a cache shared by all sessions. Settings of the
+search itself cannot reach the pool processes, and their commands
+answer with an error.
+
+Usage:
+    python gtp_server.py [--host HOST] [--port PORT | --unix PATH]
+                         [--workers N] [--cache-size N]
+"""
+import argparse
+import asyncio
+import io
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from Nogo import Nogo
+from gtp_connection import GtpConnection, color_to_int
+from simple_board import SimpleGoBoard
+from heuristic import load_engine_data
+from position_code import position_key, decode_key
+
+"""
+Commands whose search runs in the process pool
+"""
+OFFLOADED_COMMANDS = ["solve", "genmove"]
+
+"""
+Commands that only affect searches run by the session's own
+GtpConnection, which the server never does
+"""
+UNSUPPORTED_COMMANDS = ["reference_check", "trace", "progress"]
+
+"""
+Shortest search of a pool process, when its deadline has already passed
+while the search waited in the queue
+"""
+MIN_SEARCH_SECONDS = 0.01
+
+def pool_search(size, key, deadline):
+    """
+    Runs in a pool process: solve the position given by its position_key
+    until the time.time() deadline.
+    Returns (solution, stats) as GtpConnection.search does.
+    """
+    con = GtpConnection(Nogo(), decode_key(key, size))
+    seconds = max(deadline - time.time(), MIN_SEARCH_SECONDS)
+    solution = con.search(seconds)
+    return solution, con.last_stats
+
+class SolvedCache(object):
+    """
+    LRU cache of proven search results, keyed by the exact position
+    """
+
+    def __init__(self, max_entries = 100000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, board):
+        return (board.size, position_key(board))
+
+    def lookup(self, board):
+        key = self.key(board)
+        solution = self.entries.get(key)
+        if solution is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return solution
+
+    def store(self, board, solution):
+        key = self.key(board)
+        self.entries[key] = solution
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last = False)
+
+class GtpSession(object):
+    """
+    One client connection, with its own board and GtpConnection
+    """
+
+    def __init__(self, server, reader, writer):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.con = GtpConnection(Nogo(), SimpleGoBoard(7))
+        self.con.outfile = io.StringIO()
+
+    async def run(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                line = line.decode(errors = "replace")
+                parsed = self.con.parse_cmd(line)
+                if parsed is None:
+                    continue
+                command_name, args = parsed
+                if command_name == "quit":
+                    self.con.respond()
+                    await self.send()
+                    break
+                if command_name in UNSUPPORTED_COMMANDS:
+                    self.con.error("{} is not supported by the server"
+                                   .format(command_name))
+                elif command_name in OFFLOADED_COMMANDS \
+                   and not self.con.has_arg_error(command_name, len(args)):
+                    await self.offload(command_name, args)
+                else:
+                    self.con.get_cmd(line)
+                await self.send()
+        finally:
+            self.writer.close()
+
+    async def send(self):
+        self.writer.write(self.con.outfile.getvalue().encode())
+        self.con.outfile = io.StringIO()
+        await self.writer.drain()
+
+    async def offload(self, command_name, args):
+        """ Run solve or genmove with the search done in the pool """
+        con = self.con
+        seconds = None
+        if command_name == "genmove":
+            color = color_to_int(args[0].lower())
+            if con.go_engine.get_move(con.board, color) is None:
+                con.respond("resign")
+                return
+            if con.time_manager.active():
+                seconds = con.time_manager.budget(con.board, color)
+        # Wall time, including the wait for a free pool process
+        start = time.time()
+        solution = await self.server.search(con, seconds)
+        if command_name == "solve":
+            con.respond_solve(solution)
+        else:
+            con.respond_genmove(color, solution)
+            if seconds is not None:
+                con.time_manager.used(color, time.time() - start)
+
+class GtpServer(object):
+
+    def __init__(self, workers = None, cache_size = 100000):
+        self.pool = ProcessPoolExecutor(workers,
+                                        initializer = load_engine_data)
+        self.cache = SolvedCache(cache_size)
+
+    async def search(self, con, seconds = None):
+        """
+        Search the position of con in the pool, or take it from the cache.
+        seconds defaults to the time limit of con, and counts from now:
+        time spent waiting for a pool process is taken from the search.
+        Sets con.last_stats and returns the solution like con.search.
+        """
+        if seconds is None:
+            seconds = con.timelimit_seconds
+        deadline = time.time() + seconds
+        board = con.board
+        solution = self.cache.lookup(board)
+        if solution is not None:
+            con.start_stats().stop()
+            return solution
+        loop = asyncio.get_running_loop()
+        solution, stats = await loop.run_in_executor(
+            self.pool, pool_search, board.size, position_key(board), deadline)
+        con.last_stats = stats
+        if solution is not None:
+            self.cache.store(board, solution)
+        return solution
+
+    async def handle_client(self, reader, writer):
+        await GtpSession(self, reader, writer).run()
+
+    async def serve(self, host = "127.0.0.1", port = 5000, unix_path = None):
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(self.handle_client,
+                                                     unix_path)
+        else:
+            server = await asyncio.start_server(self.handle_client,
+                                                host, port)
+        async with server:
+            await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="NoGo GTP server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--unix", metavar="PATH",
+                        help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int,
+                        help="search processes, default one per CPU")
+    parser.add_argument("--cache-size", type=int, default=100000,
+                        help="proven positions kept for all sessions")
+    args = parser.parse_args()
+    load_engine_data()
+    server = GtpServer(args.workers, args.cache_size)
+    asyncio.run(server.serve(args.host, args.port, args.unix))
+
+if __name__ == '__main__':
+    main()
@@ -10,9 +10,19 @@ NEAREYEPOINTS = 2
 CAPTUREPOINTS = 2
 DEBUGMODE = False
 
+import json
+import os
 import numpy as np
 from board_util import GoBoardUtil, BLACK, WHITE, EMPTY, BORDER, MAXSIZE
 from simple_board import SimpleGoBoard
+from patterns import PatternState, NEIGHBOR_CLASS, load_policy
+
+"""
+Kinds of points returned by eye_kind, independent of the weights:
+eyes and near-eyes of color, negative for the opponent
+"""
+EYE = 2
+NEAREYE = 1
 
 def point_to_coord(point, boardsize):
     """
@@ -40,6 +50,19 @@ def eye_level(board, point, color):
     # Returns EYEPOINTS if point is an eye for color
     # Returns negative values for eyes or near-eyes of opponent color
     # Returns 0 if point is neither an eye nor a near-eye
+    return _kind_weight(eye_kind(board, point, color))
+
+def _kind_weight(kind):
+    """ Weight of a point of kind EYE, NEAREYE, their negatives or 0 """
+    weight = EYEPOINTS if abs(kind) == EYE else NEAREYEPOINTS if kind else 0
+    return weight if kind >= 0 else -weight
+
+def eye_kind(board, point, color):
+    # Returns NEAREYE if point is within 1 play of being an eye for color
+    # Returns EYE if point is an eye for color
+    # Returns -NEAREYE or -EYE for eyes or near-eyes of opponent color
+    # Returns 0 if point is neither an eye nor a near-eye
+    # Unlike the levels, kinds do not depend on the weights
     if board.board[point] != 0: # Occupied space
         return 0
     nbs = board.neighbors[point]
@@ -57,16 +80,16 @@ def eye_level(board, point, color):
                 if nb_color != EMPTY: print("Error: Unexpected value for nb_color: {}".format(nb_color))
     if color_adjacent == 3:
         if DEBUGMODE: print("Near eye for color at {}".format(format_point(point_to_coord(point, board.size))))
-        return NEAREYEPOINTS
+        return NEAREYE
     elif color_adjacent == 4:
         if DEBUGMODE: print("Eye for color at {}".format(format_point(point_to_coord(point, board.size))))
-        return EYEPOINTS
+        return EYE
     elif enemy_adjacent == 3:
         if DEBUGMODE: print("Near eye for opponent at {}".format(format_point(point_to_coord(point, board.size))))
-        return -NEAREYEPOINTS
+        return -NEAREYE
     elif enemy_adjacent == 4:
         if DEBUGMODE: print("Eye for opponent at {}".format(format_point(point_to_coord(point, board.size))))
-        return -EYEPOINTS
+        return -EYE
     return 0
 
 def capture_level(board, point, color):
@@ -103,116 +126,295 @@ def capture_level(board, point, color):
         return -CAPTUREPOINTS
     return 0
 
-def statisticaly_evaluate(board, color, move = None, oweight = None, bneyes = [], wneyes = [], beyes = [], weyes = [], CaptureMode = False):
+def statisticaly_evaluate(board, color):
     """
     Calculates an integer score for how advantageous the board is for
     player color. Score is determined by how many empty points are
     only playable for one player, or are within 1 move of being only
     playable for one player.
+    Returns (weight, bneyes, wneyes, beyes, weyes), where the lists hold
+    the near-eyes and eyes of black and white.
+    """
+    bneyes, wneyes, beyes, weyes = [], [], [], []
+    spaces = board.get_empty_points()
+    weight = 0
+    for point in spaces:
+        eyeKind = eye_kind(board, point, color)
+        weight += _kind_weight(eyeKind)
+        if color == WHITE: # eye_kind is antisymmetric in color
+            eyeKind = -eyeKind
+        if eyeKind == NEAREYE:
+            bneyes.append(point)
+        if eyeKind == -NEAREYE:
+            wneyes.append(point)
+        if eyeKind == EYE:
+            beyes.append(point)
+        if eyeKind == -EYE:
+            weyes.append(point)
+        """
+        Capturemode not implemented for new heuristic
+        if eyeScore == 0 and CaptureMode is True:
+            weight += capture_level(board, point, color)
+        """
+    return (weight, bneyes, wneyes, beyes, weyes)
+
+def _kind(border, balance):
+    """
+    eye_kind for black of an empty point, given the number of border
+    neighbors and (black neighbors - white neighbors)
+    """
+    color_adjacent = border + balance
+    enemy_adjacent = border - balance
+    if color_adjacent == 3:
+        return NEAREYE
+    elif color_adjacent == 4:
+        return EYE
+    elif enemy_adjacent == 3:
+        return -NEAREYE
+    elif enemy_adjacent == 4:
+        return -EYE
+    return 0
+
+"""
+_KIND_TABLE[border, balance + 4] == _kind(border, balance), and _KINDS
+the same table flattened, indexed by the neighbor class
+9 * border + balance + 4
+"""
+_KIND_TABLE = np.array([[_kind(border, balance - 4) for balance in range(9)]
+                        for border in range(5)], dtype = np.int32)
+_KINDS = _KIND_TABLE.flatten()
+
+def _build_tables():
+    """
+    Precompute the lookup tables used by the vectorized code.
+    Must be called again whenever the weights change.
+
+    _LEVEL_TABLE[border, balance + 4] is the eye_level for black of
+    _KIND_TABLE[border, balance + 4], and _LEVELS the same table flattened.
+    _BLACK_CHANGES and _WHITE_CHANGES hold the change of the level when
+    a black or white stone is added next to a point of each class.
+    Changes for impossible classes are never used.
+    """
+    global _LEVEL_TABLE, _LEVELS, _BLACK_CHANGES, _WHITE_CHANGES
+    weights = np.array([-EYEPOINTS, -NEAREYEPOINTS, 0,
+                        NEAREYEPOINTS, EYEPOINTS], dtype = np.int32)
+    _LEVEL_TABLE = weights[_KIND_TABLE + EYE]
+    _LEVELS = _LEVEL_TABLE.flatten()
+    _BLACK_CHANGES = np.roll(_LEVELS, -1) - _LEVELS
+    _WHITE_CHANGES = np.roll(_LEVELS, 1) - _LEVELS
+
+_build_tables()
+
+"""
+File with tuned weights written by tune_weights.py
+"""
+WEIGHTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "heuristic_weights.json")
+
+_WEIGHTS_VERSION = 0 # changed by every set_weights
+
+def set_weights(eye, neareye, capture = None):
+    """
+    Change the heuristic weights used by all evaluation functions
+    """
+    global EYEPOINTS, NEAREYEPOINTS, CAPTUREPOINTS, _WEIGHTS_VERSION
+    EYEPOINTS = eye
+    NEAREYEPOINTS = neareye
+    if capture is not None:
+        CAPTUREPOINTS = capture
+    _build_tables()
+    _WEIGHTS_VERSION += 1
+
+def weights_version():
+    """ Changes whenever the weights change, for caches of evaluations """
+    return _WEIGHTS_VERSION
+
+def get_weights():
+    return {"EYEPOINTS": EYEPOINTS,
+            "NEAREYEPOINTS": NEAREYEPOINTS,
+            "CAPTUREPOINTS": CAPTUREPOINTS}
+
+def load_weights(filename = WEIGHTS_FILE):
+    """
+    Load weights saved by tune_weights.py.
+    Keeps the default weights if the file does not exist.
+    Returns True if weights were loaded.
+    """
+    if not os.path.exists(filename):
+        return False
+    with open(filename) as f:
+        weights = json.load(f)
+    set_weights(weights["EYEPOINTS"], weights["NEAREYEPOINTS"],
+                weights.get("CAPTUREPOINTS"))
+    return True
+
+def load_engine_data():
+    """
+    Load the tuned weights and the learned move ordering policy,
+    if they exist. Called once by every engine process.
+    """
+    load_weights()
+    load_policy()
+
+def neighbor_classes(board):
+    """
+    Count the neighbor classes of all points in board.board_points at once.
+    Returns numpy arrays (border, balance), where border is the number of
+    border neighbors and balance is black neighbors - white neighbors.
+    """
+    nb_colors = board.board[board.neighbor_index]
+    border = np.count_nonzero(nb_colors == BORDER, axis = 1)
+    balance = np.count_nonzero(nb_colors == BLACK, axis = 1) \
+              - np.count_nonzero(nb_colors == WHITE, axis = 1)
+    return border, balance
+
+def black_levels(board, border, balance):
+    """
+    eye_level for black of all points in board.board_points,
+    0 for occupied points
+    """
+    levels = _LEVEL_TABLE[border, balance + 4]
+    levels[board.board[board.board_points] != EMPTY] = 0
+    return levels
+
+def vectorized_evaluate(board, color):
+    """
+    Same as statisticaly_evaluate, but classifies all points with
+    numpy array operations instead of calling eye_level per point.
     """
-    weight = oweight
-    if weight is None:
-        spaces = board.get_empty_points()
-        weight = 0
-        for point in spaces:
-            eyeScore = eye_level(board, point, color)
-            weight += eyeScore
-            if color is BLACK:
-                if eyeScore == NEAREYEPOINTS:
-                    bneyes.append(point)
-                if eyeScore == -NEAREYEPOINTS:
-                    wneyes.append(point)
-                if eyeScore == EYEPOINTS:
-                    beyes.append(point)
-                if eyeScore == -EYEPOINTS:
-                    weyes.append(point)
-            if color is WHITE:
-                if eyeScore == NEAREYEPOINTS:
-                    wneyes.append(point)
-                if eyeScore == -NEAREYEPOINTS:
-                    bneyes.append(point)
-                if eyeScore == EYEPOINTS:
-                    weyes.append(point)
-                if eyeScore == -EYEPOINTS:
-                    beyes.append(point)
-            """
-            Capturemode not implemented for new heuristic
-            if eyeScore == 0 and CaptureMode is True:
-                weight += capture_level(board, point, color)
-            """
-        return (weight, bneyes, wneyes, beyes, weyes)
-    shiftscore = 0
-    if color is BLACK:
-        if move in bneyes: # You filled your own near-eye, this is a bad move
-            shiftscore = -NEAREYEPOINTS
-            weight = weight + shiftscore
-            bneyes.remove(move)
-        elif move in wneyes: # You blocked an opponents near-eye, this is a good move
-            shiftscore = NEAREYEPOINTS
-            weight = weight + shiftscore
-            wneyes.remove(move)
-        elif move in beyes: # You filled your own eye, this is the worst move
-            shiftscore = -EYEPOINTS
-            weight = weight + shiftscore
-            beyes.remove(move)
-        elif move in weyes: # You filled your opponents eye, this is impossible
-            weight = -1000
-            #raise ValueError("played in enemy eye")
-    if color is WHITE:
-        if move in wneyes: # You filled your own near-eye, this is a bad move
-            shiftscore = -NEAREYEPOINTS
-            weight = weight + shiftscore
-            wneyes.remove(move)
-        elif move in bneyes: # You blocked an opponents near-eye, this is a good move
-            shiftscore = NEAREYEPOINTS
-            weight = weight + shiftscore
-            bneyes.remove(move)
-        elif move in weyes: # You filled your own eye, this is the worst move
-            shiftscore = -EYEPOINTS
-            weight = weight + shiftscore
-            weyes.remove(move)
-        elif move in beyes: # You filled your opponents eye, this is impossible
-            weight = -1000
-            #raise ValueError("played in enemy eye")
-    neighbors = board.neighbors[move]
-    for nb in neighbors:
-        if board.board[nb] != 0: # Occupied space, we can ignore these
-            continue
-        eyescore = eye_level(board, nb, color)
-        shiftscore = 0
-        if color is BLACK:
-            if eyescore == EYEPOINTS: # You completed an eye for black, this is a good move
-                shiftscore = EYEPOINTS - NEAREYEPOINTS
-                beyes.append(nb)
-                bneyes.remove(nb)
-            if eyescore == NEAREYEPOINTS: # You created a near-eye for black, this is a good move
-                shiftscore = NEAREYEPOINTS
-                bneyes.append(nb)
-            if eyescore == -EYEPOINTS: # Should be impossible, remove if not encountered
-                weight = -1000
-            #raise ValueError("Played on occupied space?")
-            if nb in wneyes: # You blocked your opponents near-eye, this is a good move
-                shiftscore = NEAREYEPOINTS
-                wneyes.remove(nb)
-            if nb in weyes: # Should be impossible, remove if not encountered
-                weight = -1000
-            #raise ValueError("Played on enemy occupied space?")
-        if color is WHITE:
-            if eyescore == EYEPOINTS: # You completed an eye for white, this is a good move
-                shiftscore = EYEPOINTS - NEAREYEPOINTS
-                weyes.append(nb)
-                wneyes.remove(nb)
-            if eyescore == NEAREYEPOINTS: # You created a near-eye for white, this is a good move
-                shiftscore = NEAREYEPOINTS
-                wneyes.append(nb)
-            if eyescore == -EYEPOINTS: # Should be impossible, remove if not encountered
-                weight = -1000
-            #raise ValueError("Played on occupied space?")
-            if nb in bneyes: # You blocked your opponents near-eye, this is a good move
-                shiftscore = NEAREYEPOINTS
-                bneyes.remove(nb)
-            if nb in beyes: # Should be impossible, remove if not encountered
-                weight = -1000
-            #raise ValueError("Played on enemy occupied space?")
-        weight += shiftscore
+    border, balance = neighbor_classes(board)
+    levels = black_levels(board, border, balance)
+    kinds = _KIND_TABLE[border, balance + 4]
+    kinds[board.board[board.board_points] != EMPTY] = 0
+    points = board.board_points
+    weight = int(levels.sum())
+    if color == WHITE:
+        weight = -weight
+    bneyes = list(points[kinds == NEAREYE])
+    wneyes = list(points[kinds == -NEAREYE])
+    beyes = list(points[kinds == EYE])
+    weyes = list(points[kinds == -EYE])
     return (weight, bneyes, wneyes, beyes, weyes)
+
+class HeuristicState(object):
+    """
+    Incremental version of statisticaly_evaluate.
+
+    The neighbor class of a point combines the number of border neighbors
+    and the balance (black neighbors - white neighbors) into one index of
+    _LEVELS. It is read from the 3x3 pattern code of the point, which a
+    PatternState keeps up to date. The eye level of an empty point only
+    depends on its class, so playing or undoing a move changes the score
+    by looking at the neighbors of the move only, and all candidate moves
+    of a position can be scored at once with a few array lookups.
+    The score is kept from black's point of view, white's is its negative.
+    """
+
+    def __init__(self, board, black_score = None):
+        """ black_score is the evaluation of board for black, if known """
+        self.board = board
+        if black_score is None:
+            border, balance = neighbor_classes(board)
+            black_score = int(black_levels(board, border, balance).sum())
+        self.black_score = black_score
+        self.patterns = PatternState(board)
+        # Neighbors indexed by point instead of by board_points index.
+        # Rows of BORDER points are never used.
+        self.neighbor_index = np.zeros((board.maxpoint, 4), dtype = np.int32)
+        self.neighbor_index[board.board_points] = board.neighbor_index
+        self.deltas = [] # score changes of the moves played, for undo
+
+    def level(self, point):
+        """ eye_level(board, point, BLACK) of an empty point """
+        return _LEVELS[NEIGHBOR_CLASS[self.patterns.codes[point]]]
+
+    def kind(self, point):
+        """ eye_kind(board, point, BLACK) of an empty point """
+        return _KINDS[NEIGHBOR_CLASS[self.patterns.codes[point]]]
+
+    def score(self, color):
+        """ statisticaly_evaluate score for color """
+        if color == BLACK:
+            return self.black_score
+        return -self.black_score
+
+    def is_eye(self, point, color):
+        """
+        Point is an eye for color. Playing there is always illegal
+        for the opponent: it is either suicide or a capture.
+        """
+        if color == BLACK:
+            return self.kind(point) == EYE
+        return self.kind(point) == -EYE
+
+    def move_delta(self, point, color):
+        """
+        Change of black's score if color played on the empty point.
+        The board is not modified.
+        """
+        changes = _BLACK_CHANGES if color == BLACK else _WHITE_CHANGES
+        board = self.board.board
+        codes = self.patterns.codes
+        delta = -_LEVELS[NEIGHBOR_CLASS[codes[point]]]
+        for nb in self.board.neighbors[point]:
+            if board[nb] == EMPTY:
+                delta += changes[NEIGHBOR_CLASS[codes[nb]]]
+        return int(delta)
+
+    def move_deltas(self, moves, color):
+        """
+        move_delta for all the empty points in the numpy array moves at once.
+        Returns (deltas, levels), where levels are the black eye levels
+        of the moves themselves.
+        """
+        changes = _BLACK_CHANGES if color == BLACK else _WHITE_CHANGES
+        codes = self.patterns.codes
+        nbs = self.neighbor_index[moves]
+        nb_changes = changes[NEIGHBOR_CLASS[codes[nbs]]]
+        nb_changes *= self.board.board[nbs] == EMPTY
+        levels = _LEVELS[NEIGHBOR_CLASS[codes[moves]]]
+        return nb_changes.sum(axis = 1) - levels, levels
+
+    def score_moves(self, moves, color):
+        """
+        Score all candidate moves of color at once, without playing them.
+        moves is a numpy array of empty points.
+        Returns (scores, deltas, in_eye): scores[i] is the score for color
+        after playing moves[i], deltas[i] is the change of black's score
+        to pass to play, and in_eye[i] tells whether moves[i] is an eye of
+        the opponent. Eyes are found from the neighbors, not the levels,
+        since equal weights would make near-eyes look like eyes.
+        """
+        deltas, levels = self.move_deltas(moves, color)
+        kinds = _KINDS[NEIGHBOR_CLASS[self.patterns.codes[moves]]]
+        if color == BLACK:
+            return self.black_score + deltas, deltas, kinds == -EYE
+        return -self.black_score - deltas, deltas, kinds == EYE
+
+    def play(self, point, color, delta = None):
+        """
+        Update after color played on point.
+        delta is the precomputed move_delta, if known.
+        """
+        if delta is None:
+            delta = self.move_delta(point, color)
+        self.black_score += delta
+        self.deltas.append(delta)
+        self.patterns.play(point, color)
+
+    def undo(self, point, color):
+        """ Exact inverse of the last play """
+        self.patterns.undo(point, color)
+        self.black_score -= self.deltas.pop()
+
+    def eye_points(self):
+        """
+        Returns (bneyes, wneyes, beyes, weyes) like statisticaly_evaluate
+        """
+        points = self.board.board_points
+        kinds = _KINDS[NEIGHBOR_CLASS[self.patterns.codes[points]]]
+        kinds[self.board.board[points] != EMPTY] = 0
+        return (list(points[kinds == NEAREYE]),
+                list(points[kinds == -NEAREYE]),
+                list(points[kinds == EYE]),
+                list(points[kinds == -EYE]))
@@ -0,0 +1,41 @@
+"""
+legality_cache.py
+
+Small LRU cache of legal moves, keyed by the position and the color
+to play. GUI analysis commands ask for the legal moves and the game
+result after every move, so repeated queries on an unchanged board
+are answered without calling is_legal again.
+"""
+from collections import OrderedDict
+from board_util import GoBoardUtil
+from position_code import encode
+
+class LegalityCache(object):
+
+    def __init__(self, max_entries = 64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, board, color):
+        return (board.size, color, board.ko_recapture, encode(board))
+
+    def legal_moves(self, board, color):
+        """ List of the legal moves of color on board, as points """
+        key = self.key(board, color)
+        moves = self.entries.get(key)
+        if moves is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return moves
+        self.misses += 1
+        moves = GoBoardUtil.generate_legal_moves(board, color)
+        self.entries[key] = moves
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last = False)
+        return moves
+
+    def is_terminal(self, board, color):
+        """ The game is over when color has no legal move """
+        return len(self.legal_moves(board, color)) == 0
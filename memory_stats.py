@@ -0,0 +1,97 @@
+"""
+memory_stats.py
+
+Memory accounting for the solver, reported by the memory command.
+
+The transposition table is the only structure that grows without bound
+during a search. A MemoryMonitor with a limit bounds the number of
+table entries, so that the table evicts old entries instead of growing
+until the process is killed. Allocation hot spots can be traced with
+tracemalloc, which is off by default since it slows the search a lot.
+"""
+import os
+import resource
+import tracemalloc
+
+"""
+The table is never limited to fewer entries than this,
+whatever the memory limit
+"""
+MIN_TT_ENTRIES = 10000
+
+"""
+Number of allocation sites listed by the memory command when tracing
+"""
+TRACE_TOP = 10
+
+def rss_bytes():
+    """ Current resident set size of the process, 0 if unknown """
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def peak_rss_bytes():
+    """ Largest resident set size of the process so far """
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def megabytes(n):
+    return "{:.1f}MB".format(n / (1024 * 1024))
+
+class MemoryMonitor(object):
+
+    def __init__(self):
+        self.limit_bytes = None # memory ceiling of the process, None for none
+        self.tracing = False
+
+    def set_limit(self, megabytes):
+        """ Set the ceiling in megabytes, 0 or None to remove it """
+        if not megabytes:
+            self.limit_bytes = None
+        else:
+            self.limit_bytes = int(megabytes * 1024 * 1024)
+
+    def apply_limit(self, tt):
+        """
+        Bound the entries of tt so that the process stays under the limit.
+        Memory not used by the table is assumed to stay constant,
+        so this is called before each search.
+        """
+        if self.limit_bytes is None:
+            tt.max_entries = None
+            return
+        other_bytes = max(rss_bytes() - tt.memory_bytes(), 0)
+        entries = (self.limit_bytes - other_bytes) // tt.entry_bytes()
+        tt.max_entries = max(int(entries), MIN_TT_ENTRIES)
+
+    def start_trace(self):
+        if not self.tracing:
+            tracemalloc.start()
+            self.tracing = True
+
+    def stop_trace(self):
+        if self.tracing:
+            tracemalloc.stop()
+            self.tracing = False
+
+    def report(self, tt = None):
+        lines = ["rss {}".format(megabytes(rss_bytes())),
+                 "peak_rss {}".format(megabytes(peak_rss_bytes())),
+                 "limit {}".format("none" if self.limit_bytes is None
+                                   else megabytes(self.limit_bytes))]
+        if tt is not None:
+            lines.append("tt_entries {}".format(len(tt.table)))
+            lines.append("tt_bytes {}".format(megabytes(tt.memory_bytes())))
+            lines.append("tt_max_entries {}".format(tt.max_entries or "none"))
+            lines.append("tt_evictions {}".format(tt.evictions))
+        if self.tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            lines.append("traced {} peak {}".format(megabytes(current),
+                                                     megabytes(peak)))
+            snapshot = tracemalloc.take_snapshot()
+            for stat in snapshot.statistics("lineno")[:TRACE_TOP]:
+                lines.append(str(stat))
+        return '\n'.join(lines)
@@ -0,0 +1,181 @@
+"""
+patterns.py
+
+3x3 neighborhood patterns of the points of the board.
+
+The pattern code of a point combines the colors of its 8 neighbors,
+border included, 2 bits each: the 4 direct neighbors west, east,
+south, north, then the 4 diagonal neighbors. Lookup tables indexed by
+the code classify an empty point in one array read: eye, false eye,
+surrounded, heuristic neighbor class, and a legality hint.
+
+PatternState keeps the codes of all points up to date on play and
+undo, by adding the new stone to the codes of its 8 neighbors.
+
+A move ordering policy, learned by train_policy.py, gives a weight to
+the pattern around each candidate move, seen from the player to move.
+"""
+import os
+import numpy as np
+from board_util import EMPTY, BLACK, WHITE, BORDER
+
+NUM_PATTERNS = 4 ** 8
+
+"""
+Legality hints: the move is certainly legal, certainly illegal,
+or must be checked by play_move
+"""
+LEGAL = 1
+ILLEGAL = -1
+UNKNOWN = 0
+
+"""
+_OPPOSITE[i] is the index of the neighbor in direction -offset[i]
+"""
+_OPPOSITE = [1, 0, 3, 2, 7, 6, 5, 4]
+_WEIGHTS = 4 ** np.arange(8, dtype = np.int32)
+
+"""
+File with the policy weights written by train_policy.py
+"""
+POLICY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "pattern_policy.npy")
+
+_POLICY = None # weight of every pattern code for black, None if not loaded
+
+def neighborhood_offsets(board):
+    """ Offsets of the 8 neighbors, in the order of the pattern code """
+    NS = board.NS
+    return np.array([-1, 1, -NS, NS, -NS - 1, -NS + 1, NS - 1, NS + 1],
+                    dtype = np.int32)
+
+def pattern_codes(board):
+    """
+    Pattern codes of all points, as a numpy array of size maxpoint.
+    Codes of border points are 0.
+    """
+    points = board.board_points
+    codes = np.zeros(board.maxpoint, dtype = np.int32)
+    colors = board.board[points[:, None] + neighborhood_offsets(board)]
+    codes[points] = colors @ _WEIGHTS
+    return codes
+
+def _build_tables():
+    """
+    Tables indexed by [color, code]: EYE, FALSE_EYE, SURROUNDED and
+    LEGALITY, with the same rules as SimpleGoBoard.is_eye and
+    _is_surrounded. NEIGHBOR_CLASS[code] is the HeuristicState class
+    9 * border + balance + 4 of the point. SWAP_COLORS[code] is the
+    code with black and white exchanged.
+    """
+    global EYE, FALSE_EYE, SURROUNDED, LEGALITY, NEIGHBOR_CLASS, SWAP_COLORS
+    codes = np.arange(NUM_PATTERNS)
+    colors = (codes[:, None] // _WEIGHTS) % 4
+    swapped = np.choose(colors, [EMPTY, WHITE, BLACK, BORDER])
+    SWAP_COLORS = (swapped @ _WEIGHTS).astype(np.int32)
+    direct, diagonal = colors[:, :4], colors[:, 4:]
+    border = np.count_nonzero(direct == BORDER, axis = 1)
+    balance = np.count_nonzero(direct == BLACK, axis = 1) \
+              - np.count_nonzero(direct == WHITE, axis = 1)
+    NEIGHBOR_CLASS = (9 * border + balance + 4).astype(np.int32)
+    at_edge = np.any(diagonal == BORDER, axis = 1)
+    has_liberty = np.any(direct == EMPTY, axis = 1)
+    EYE = np.zeros((3, NUM_PATTERNS), dtype = bool)
+    FALSE_EYE = np.zeros((3, NUM_PATTERNS), dtype = bool)
+    SURROUNDED = np.zeros((3, NUM_PATTERNS), dtype = bool)
+    LEGALITY = np.zeros((3, NUM_PATTERNS), dtype = np.int8)
+    for color in (BLACK, WHITE):
+        opp_color = BLACK + WHITE - color
+        surrounded = np.all((direct == color) | (direct == BORDER), axis = 1)
+        false_count = np.count_nonzero(diagonal == opp_color, axis = 1)
+        eye = surrounded & (false_count <= 1 - at_edge)
+        SURROUNDED[color] = surrounded
+        EYE[color] = eye
+        FALSE_EYE[color] = surrounded & ~eye
+        # No liberty: suicide or capture
+        LEGALITY[color, np.all((direct == opp_color) | (direct == BORDER),
+                               axis = 1)] = ILLEGAL
+        # A liberty, and nothing to capture
+        LEGALITY[color, has_liberty
+                 & ~np.any(direct == opp_color, axis = 1)] = LEGAL
+
+_build_tables()
+
+def mover_codes(codes, color):
+    """ Pattern codes as seen by color: own stones are black """
+    if color == BLACK:
+        return codes
+    return SWAP_COLORS[codes]
+
+def set_policy(weights):
+    """ Use the pattern weights for move ordering, None for none """
+    global _POLICY
+    _POLICY = None if weights is None \
+              else np.asarray(weights, dtype = np.float32)
+
+def get_policy():
+    return _POLICY
+
+def load_policy(filename = POLICY_FILE):
+    """
+    Load the policy saved by train_policy.py.
+    Returns True if it was loaded.
+    """
+    if not os.path.exists(filename):
+        return False
+    set_policy(np.load(filename))
+    return True
+
+def policy_scores(codes, color):
+    """
+    Policy weights of the moves of color with pattern codes codes,
+    or None if no policy is loaded
+    """
+    if _POLICY is None:
+        return None
+    return _POLICY[mover_codes(codes, color)]
+
+class PatternState(object):
+    """
+    Pattern codes of all points of board, updated on play and undo
+    """
+
+    def __init__(self, board):
+        self.board = board
+        self.codes = pattern_codes(board)
+        # The 8 neighbors of every point. Rows of border points are
+        # never used, and clipped to stay inside the board array.
+        self.neighborhood = np.clip(
+            np.arange(board.maxpoint)[:, None] + neighborhood_offsets(board),
+            0, board.maxpoint - 1)
+        # Change of the neighbor codes when a stone of each color is added
+        self.changes = [None, BLACK * _WEIGHTS[_OPPOSITE],
+                        WHITE * _WEIGHTS[_OPPOSITE]]
+
+    def play(self, point, color):
+        """ Update after color played on point """
+        self.codes[self.neighborhood[point]] += self.changes[color]
+
+    def undo(self, point, color):
+        """ Exact inverse of play """
+        self.codes[self.neighborhood[point]] -= self.changes[color]
+
+    def is_eye(self, point, color):
+        """ Same as board.is_eye(point, color) for an empty point """
+        return EYE[color, self.codes[point]]
+
+    def is_false_eye(self, point, color):
+        return FALSE_EYE[color, self.codes[point]]
+
+    def is_surrounded(self, point, color):
+        return SURROUNDED[color, self.codes[point]]
+
+    def legality_hints(self, moves, color):
+        """ LEGAL, ILLEGAL or UNKNOWN for each empty point in moves """
+        return LEGALITY[color, self.codes[moves]]
+
+    def eyes(self, color):
+        """ Empty points that are eyes of color, as a numpy array """
+        points = self.board.board_points
+        empty = self.board.board[points] == EMPTY
+        return points[empty & EYE[color, self.codes[points]]]
@@ -0,0 +1,94 @@
+"""
+pondering.py
+
+Search on the opponent's time.
+
+GTP input is read by a background thread. While no command is waiting,
+the main thread solves the current position into the connection's
+transposition table, which is kept for the next genmove or solve.
+When a command arrives, the reader thread sends SIGUSR1 to the main
+thread, which stops the search at once. Everything stored in the
+transposition table so far stays valid, since only proven results
+are stored. The ponder search uses the same heuristic and symmetry
+settings as the connection's own searches.
+"""
+import queue
+import signal
+import threading
+from search_stats import SearchStats
+
+class PonderInterrupt(Exception):
+    pass
+
+class Ponderer(object):
+
+    def __init__(self, con):
+        self.con = con
+        self.enabled = False
+        self.active = False # main thread is pondering
+        self.lines = queue.Queue()
+        self.last_stats = None # SearchStats of the last ponder search
+        self._main_thread = threading.main_thread().ident
+
+    def start_reader(self, infile):
+        """ Read infile in a background thread. Must be called in the main thread """
+        signal.signal(signal.SIGUSR1, self._interrupt)
+        reader = threading.Thread(target = self._read, args = (infile,),
+                                  daemon = True)
+        reader.start()
+
+    def _read(self, infile):
+        line = infile.readline()
+        while line:
+            self._put(line)
+            line = infile.readline()
+        self._put(None)
+
+    def _put(self, line):
+        self.lines.put(line)
+        if self.active:
+            signal.pthread_kill(self._main_thread, signal.SIGUSR1)
+
+    def _interrupt(self, signum, frame):
+        if self.active:
+            self.active = False
+            raise PonderInterrupt
+
+    def next_line(self):
+        """
+        Next input line, pondering while waiting for it if enabled.
+        Returns None at the end of the input.
+        """
+        if self.enabled and self.lines.empty():
+            self.ponder()
+        return self.lines.get()
+
+    def ponder(self):
+        """
+        Solve the current position until it is solved
+        or a command arrives.
+        """
+        from gtp_connection import negamax # gtp_connection imports this module
+        board = self.con.board
+        if len(board.get_empty_points()) == 0:
+            return
+        tt = self.con.get_tt()
+        if tt.lookup(tt.code(board)) is not None:
+            return # already solved
+        stats = SearchStats()
+        stats.start()
+        self.last_stats = stats
+        self.active = True
+        try:
+            # A line that arrived before active was set sent no signal
+            if self.lines.empty():
+                board = board.copy()
+                negamax(board, tt,
+                        hstate = self.con.heuristic_state(board, stats),
+                        HeuristicMode = self.con.heuristic_mode,
+                        SymmetryCheck = self.con.symmetry_check,
+                        stats = stats)
+            self.active = False
+        except PonderInterrupt:
+            pass
+        stats.stop("ponder")
@@ -0,0 +1,64 @@
+"""
+position_code.py
+
+Compact exact encoding of positions.
+
+Each point holds EMPTY, BLACK or WHITE, a digit in base 3. Five points
+are packed into each byte, since 3**5 = 243 fits in 8 bits, so a 7x7
+position takes 10 bytes instead of the 4 * 73 bytes of board.board.
+Codes are bytes objects: hashable, comparable, and cheap to send to
+another process or write to disk.
+"""
+import numpy as np
+from simple_board import SimpleGoBoard
+
+"""
+Number of points packed into one byte
+"""
+POINTS_PER_BYTE = 5
+
+_POWERS = 3 ** np.arange(POINTS_PER_BYTE, dtype = np.int32)
+
+def _pack(colors):
+    """ Pack a 1D array of colors, in row major order, into bytes """
+    padding = -len(colors) % POINTS_PER_BYTE
+    digits = np.concatenate((colors, np.zeros(padding, dtype = colors.dtype)))
+    digits = digits.reshape(-1, POINTS_PER_BYTE)
+    return (digits @ _POWERS).astype(np.uint8).tobytes()
+
+def _unpack(code, size):
+    """ 1D int32 array of the size * size colors packed in code """
+    values = np.frombuffer(code, dtype = np.uint8).astype(np.int32)
+    digits = (values[:, None] // _POWERS) % 3
+    return digits.reshape(-1)[:size * size]
+
+def encode(board):
+    """ Code of the stones of a SimpleGoBoard """
+    return _pack(board.board[board.board_points])
+
+def encode_2d(board2d):
+    """ Code of the stones of a board from GoBoardUtil.get_twoD_board """
+    return _pack(np.asarray(board2d).reshape(-1))
+
+def decode(code, size):
+    """ New SimpleGoBoard of given size with the stones of code, black to play """
+    board = SimpleGoBoard(size)
+    board.board[board.board_points] = _unpack(code, size)
+    return board
+
+def decode_2d(code, size):
+    """ The stones of code as a two dimensional array, like get_twoD_board """
+    return _unpack(code, size).reshape(size, size)
+
+def position_key(board):
+    """
+    Exact key of the position: the player to move followed by the stones.
+    The ko point is not included, since there are no captures in NoGo.
+    """
+    return bytes((board.current_player,)) + encode(board)
+
+def decode_key(key, size):
+    """ New SimpleGoBoard for a key from position_key """
+    board = decode(key[1:], size)
+    board.current_player = key[0]
+    return board
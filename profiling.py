@@ -0,0 +1,207 @@
+"""
+profiling.py
+
+Profiling support for the engine, controlled through GTP commands
+or command line flags of Nogo.py.
+
+- Profiler runs the solve, genmove and evaluate commands under
+  cProfile, writing .pstats files, or under StackSampler, writing
+  collapsed stacks (.folded) which flamegraph tools read directly.
+- FunctionTimers times the hot board primitives. Timed functions are
+  swapped in when timers are enabled and the originals are restored
+  when they are disabled, so disabled timers cost nothing.
+"""
+import cProfile
+import os
+import signal
+from time import perf_counter
+from simple_board import SimpleGoBoard
+from transposition_table import TranspositionTable, TTUtil
+import heuristic
+
+"""
+GTP commands run under the profiler
+"""
+PROFILED_COMMANDS = ["solve", "genmove", "evaluate"]
+
+"""
+Functions timed by FunctionTimers, as (owner, attribute name)
+"""
+HOT_FUNCTIONS = [
+    (SimpleGoBoard, "is_legal"),
+    (SimpleGoBoard, "play_move"),
+    (SimpleGoBoard, "undo_move"),
+    (SimpleGoBoard, "_block_of"),
+    (SimpleGoBoard, "get_empty_points"),
+    (SimpleGoBoard, "copy"),
+    (TranspositionTable, "code"),
+    (TranspositionTable, "code_2d"),
+    (TranspositionTable, "lookup"),
+    (TranspositionTable, "store"),
+    (TTUtil, "symmetries"),
+    (heuristic.HeuristicState, "score_moves"),
+    (heuristic.HeuristicState, "play"),
+    (heuristic.HeuristicState, "undo"),
+    (heuristic, "eye_level"),
+]
+
+class StackSampler(object):
+    """
+    Statistical profiler. A SIGPROF timer interrupts the program every
+    interval seconds of CPU time and the current Python stack is counted.
+    """
+
+    def __init__(self, interval = 0.001):
+        self.interval = interval
+        self.counts = {}
+        self._old_handler = None
+
+    def _sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append("{}:{}".format(
+                os.path.basename(code.co_filename), code.co_name))
+            frame = frame.f_back
+        key = ';'.join(reversed(stack))
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def start(self):
+        self._old_handler = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, self._old_handler)
+
+    def write(self, filename):
+        """ Write collapsed stacks, one 'frame;frame;... count' per line """
+        with open(filename, "w") as f:
+            for stack, count in sorted(self.counts.items()):
+                f.write("{} {}\n".format(stack, count))
+
+class Profiler(object):
+    """
+    Runs GTP commands under a profiler.
+    mode is None (off), "cprofile" or "sample".
+    """
+    MODES = ["cprofile", "sample"]
+
+    def __init__(self, mode = None, directory = "."):
+        self.mode = mode
+        self.directory = directory
+        self.count = 0
+        self.last_file = None
+
+    def active(self, command_name):
+        return self.mode is not None and command_name in PROFILED_COMMANDS
+
+    def run(self, command_name, func, args):
+        """
+        Run func(args) under the profiler and write the profile to
+        directory/<command_name>-<n>.pstats or .folded
+        """
+        self.count += 1
+        os.makedirs(self.directory, exist_ok = True)
+        base = os.path.join(self.directory,
+                            "{}-{}".format(command_name, self.count))
+        if self.mode == "cprofile":
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                func(args)
+            finally:
+                profile.disable()
+                self.last_file = base + ".pstats"
+                profile.dump_stats(self.last_file)
+        else:
+            sampler = StackSampler()
+            sampler.start()
+            try:
+                func(args)
+            finally:
+                sampler.stop()
+                self.last_file = base + ".folded"
+                sampler.write(self.last_file)
+
+_ACTIVE_TIMERS = [] # enabled FunctionTimers, the functions are patched
+_ORIGINALS = [] # (owner, attribute, original) of the patched functions
+
+def _function_name(owner, attribute):
+    return "{}.{}".format(owner.__name__, attribute)
+
+def _timed(name, func):
+    """ func, counting its calls and time in every enabled FunctionTimers """
+    def timed(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = perf_counter() - start
+            for timers in _ACTIVE_TIMERS:
+                total = timers.totals[name]
+                total[0] += 1
+                total[1] += elapsed
+    return timed
+
+def _patch():
+    for owner, attribute in HOT_FUNCTIONS:
+        name = _function_name(owner, attribute)
+        original = owner.__dict__[attribute]
+        _ORIGINALS.append((owner, attribute, original))
+        if isinstance(original, staticmethod):
+            timed = staticmethod(_timed(name, original.__func__))
+        else:
+            timed = _timed(name, original)
+        setattr(owner, attribute, timed)
+
+def _unpatch():
+    for owner, attribute, original in _ORIGINALS:
+        setattr(owner, attribute, original)
+    del _ORIGINALS[:]
+
+class FunctionTimers(object):
+    """
+    Call counts and total time of the functions in HOT_FUNCTIONS.
+    The functions are patched once per process, while at least one
+    FunctionTimers is enabled, such as one per gtp_server session.
+    Each enabled FunctionTimers counts all calls of the process.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.totals = {}
+
+    def enable(self):
+        if self.enabled:
+            return
+        for owner, attribute in HOT_FUNCTIONS:
+            self.totals.setdefault(_function_name(owner, attribute), [0, 0.0])
+        if not _ACTIVE_TIMERS:
+            _patch()
+        _ACTIVE_TIMERS.append(self)
+        self.enabled = True
+
+    def disable(self):
+        if not self.enabled:
+            return
+        _ACTIVE_TIMERS.remove(self)
+        if not _ACTIVE_TIMERS:
+            _unpatch()
+        self.enabled = False
+
+    def reset(self):
+        for total in self.totals.values():
+            total[0] = 0
+            total[1] = 0.0
+
+    def report(self):
+        """ Table of calls, total and per call time, slowest first """
+        lines = ["{:<34} {:>10} {:>10} {:>10}".format(
+            "function", "calls", "total_s", "per_call_us")]
+        ordered = sorted(self.totals.items(), key = lambda item: -item[1][1])
+        for name, (calls, seconds) in ordered:
+            per_call = seconds / calls * 1e6 if calls else 0.0
+            lines.append("{:<34} {:>10} {:>10.4f} {:>10.2f}".format(
+                name, calls, seconds, per_call))
+        return '\n'.join(lines)
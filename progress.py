@@ -0,0 +1,85 @@
+"""
+progress.py
+
+Live progress of long searches, written on stderr while they run.
+
+A background thread wakes up every interval seconds and reports the
+root move being searched, the root moves already refuted, the search
+speed and the number of transposition table entries. negamax only
+records its root moves in the SearchStats, so reporting costs nothing
+in the search, and nothing at all when it is off.
+
+In gfx mode the report is a gogui-gfx block, which GoGui shows live
+on the board: the current move as a variation, refuted moves as
+squares, and the numbers as text.
+"""
+import threading
+from sys import stderr
+from board_util import BLACK
+
+"""
+Report modes
+"""
+MODES = ["stderr", "gfx"]
+
+"""
+Seconds between reports by default
+"""
+DEFAULT_INTERVAL = 1.0
+
+class ProgressReporter(object):
+
+    def __init__(self):
+        self.mode = None # None when off
+        self.interval = DEFAULT_INTERVAL
+        self.outfile = stderr
+        self._stop = None
+        self._thread = None
+
+    def start(self, stats, tt, board):
+        """ Report on the search of board until stop is called """
+        if self.mode is None:
+            return
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target = self._run, args = (stats, tt, board, self._stop),
+            daemon = True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self, stats, tt, board, stop):
+        while not stop.wait(self.interval):
+            self.report(stats, tt, board)
+
+    def report(self, stats, tt, board):
+        # gtp_connection imports this module
+        from gtp_connection import format_point, point_to_coord
+        def name(move):
+            return format_point(point_to_coord(move, board.size))
+        color = "b" if board.current_player == BLACK else "w"
+        current = stats.root_move
+        refuted = [name(move) for move in list(stats.refuted)]
+        fill = "{}".format(len(tt.table))
+        if tt.max_entries:
+            fill += " ({:.0%})".format(len(tt.table) / tt.max_entries)
+        text = "move {} refuted {} nodes {} nps {:.0f} tt {} seconds {:.1f}" \
+            .format(name(current) if current is not None else "-",
+                    len(refuted), stats.nodes, stats.nodes_per_second(),
+                    fill, stats.seconds())
+        if self.mode == "gfx":
+            lines = ["gogui-gfx:", "TEXT " + text]
+            if refuted:
+                lines.append("SQUARE " + ' '.join(refuted))
+            if current is not None:
+                lines.append("VAR {} {}".format(color, name(current)))
+            self.outfile.write('\n'.join(lines) + "\n\n")
+        else:
+            self.outfile.write("progress: {} [{}]\n".format(
+                text, ' '.join(refuted)))
+        self.outfile.flush()
@@ -0,0 +1,98 @@
+"""
+proof_tree.py
+
+Winning moves kept across the game, so that genmove in a won game
+is a lookup instead of a search.
+
+When a search proves a win, the transposition table holds a proof:
+our winning move, and a proven win for every answer of the opponent.
+After each winning move, the ProofTree reads from the table our
+winning move after every opponent answer and keeps it by exact
+position. These few entries survive table evictions, and moves proven
+through a symmetric position are found by trying our moves against
+the table, so they are always moves of the actual position.
+"""
+import time
+from board_util import GoBoardUtil
+from transposition_table import TTUtil
+from position_code import position_key
+
+def proven_result(board, tt):
+    """
+    Result of board in tt as (win, move), from the position itself or
+    one of its symmetric positions, or None. The move of a symmetric
+    position is not a move of board.
+    """
+    result = tt.lookup(tt.code(board))
+    if result is not None:
+        return result
+    twoD_board = GoBoardUtil.get_twoD_board(board)
+    for tdb in TTUtil.symmetries(twoD_board):
+        result = tt.lookup(tt.code_2d(tdb, board.current_player))
+        if result is not None:
+            return result
+    return None
+
+def winning_move(board, tt):
+    """
+    A move that tt proves to win for the player to move on board,
+    or None if tt does not prove one
+    """
+    color = board.current_player
+    result = tt.lookup(tt.code(board))
+    if result is not None:
+        win, move = result
+        if win and board.is_legal(move, color):
+            return move
+        if not win:
+            return None
+    for move in GoBoardUtil.generate_legal_moves(board, color):
+        board.play_move(move, color)
+        result = proven_result(board, tt)
+        board.undo_move(move, color)
+        if result is not None and not result[0]:
+            return move
+    return None
+
+class ProofTree(object):
+
+    def __init__(self):
+        self.enabled = True
+        self.moves = {} # position_key -> winning move
+        self.size = None
+        self.hits = 0
+
+    def clear(self):
+        self.moves = {}
+        self.size = None
+
+    def lookup(self, board):
+        """ Our winning move on board, or None if it is not in the tree """
+        if not self.enabled or board.size != self.size:
+            return None
+        move = self.moves.get(position_key(board))
+        if move is not None:
+            self.hits += 1
+        return move
+
+    def extend(self, board, tt, deadline = None):
+        """
+        Called after our winning move on board, with the opponent to play.
+        Keep our winning move after every answer of the opponent,
+        until the time.time() deadline if given.
+        """
+        if not self.enabled:
+            return
+        if board.size != self.size:
+            self.clear()
+            self.size = board.size
+        board = board.copy()
+        color = board.current_player
+        for answer in GoBoardUtil.generate_legal_moves(board, color):
+            if deadline is not None and time.time() > deadline:
+                return
+            board.play_move(answer, color)
+            move = winning_move(board, tt)
+            if move is not None:
+                self.moves[position_key(board)] = move
+            board.undo_move(answer, color)
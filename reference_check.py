@@ -0,0 +1,309 @@
+"""
+reference_check.py
+
+Differential checking of the optimized paths against the reference
+implementations:
+- legal moves: SimpleGoBoard.is_legal against every backend of
+  benchmark_primitives and the LegalityCache
+- hashes: TranspositionTable.code against code_2d and, for the children,
+  child_codes, and the position_code round trip
+- evaluation: statisticaly_evaluate against vectorized_evaluate, a new
+  HeuristicState, and the HeuristicState updated move by move
+- patterns: the pattern tables against SimpleGoBoard.is_eye and is_legal,
+  and the pattern codes updated move by move against new ones
+- solve: negamax with heuristic ordering and symmetry against plain
+  negamax, on positions with few empty points
+
+Random games are checked after every move. A mismatch is shrunk to a
+minimal sequence of moves that still shows it.
+
+ReferenceChecker runs the same checks on a sample of the positions
+searched by a GtpConnection, see the reference_check command. They run
+after the response, each within its own time limit.
+
+Usage:
+    python reference_check.py [--size N] [--games N] [--seed N] [--no-solve]
+"""
+import argparse
+import random
+import signal
+from sys import stderr
+from board_util import GoBoardUtil, BLACK, WHITE
+from benchmark_primitives import BOARD_BACKENDS
+from heuristic import statisticaly_evaluate, vectorized_evaluate, \
+                      HeuristicState, load_weights
+from legality_cache import LegalityCache
+from patterns import PatternState, pattern_codes, LEGAL, ILLEGAL
+from position_code import position_key, decode_key
+from simple_board import SimpleGoBoard
+from transposition_table import TranspositionTable
+
+"""
+Solve results are checked on positions with at most this many empty points
+"""
+SOLVE_MAX_EMPTY = 9
+
+"""
+Seconds allowed to one sampled check of ReferenceChecker
+"""
+CHECK_SECONDS = 1.0
+
+def reference_legal_moves(board, color):
+    return set(int(point) for point in board.get_empty_points()
+               if board.is_legal(point, color))
+
+def check_legality(board):
+    for color in (BLACK, WHITE):
+        expected = reference_legal_moves(board, color)
+        for name, backend in BOARD_BACKENDS.items():
+            other = backend(board.size)
+            other.board[:] = board.board
+            other.current_player = board.current_player
+            other.ko_recapture = board.ko_recapture
+            moves = set(int(point) for point in
+                        GoBoardUtil.generate_legal_moves(other, color))
+            if moves != expected:
+                return "{} legal moves of {}: {} != {}".format(
+                    name, color, sorted(moves), sorted(expected))
+        moves = set(int(point) for point in
+                    LegalityCache().legal_moves(board, color))
+        if moves != expected:
+            return "cached legal moves of {}: {} != {}".format(
+                color, sorted(moves), sorted(expected))
+    return None
+
+def check_hashes(board):
+    tt = TranspositionTable(board.size)
+    code = tt.code(board)
+    code_2d = tt.code_2d(GoBoardUtil.get_twoD_board(board),
+                         board.current_player)
+    if code != code_2d:
+        return "code {} != code_2d {}".format(code, code_2d)
+    color = board.current_player
+    moves = GoBoardUtil.generate_legal_moves(board, color)
+    child_codes = tt.child_codes(code, moves, color)
+    for move, child_code in zip(moves, child_codes):
+        board.play_move(move, color)
+        played_code = tt.code(board)
+        board.undo_move(move, color)
+        if child_code != played_code:
+            return "child code {} != code {} after {}".format(
+                child_code, played_code, move)
+    decoded = decode_key(position_key(board), board.size)
+    if (decoded.board != board.board).any() \
+       or decoded.current_player != board.current_player:
+        return "position_code round trip changed the position"
+    return None
+
+def check_evaluation(board):
+    hstate = HeuristicState(board)
+    for color in (BLACK, WHITE):
+        expected = statisticaly_evaluate(board, color)
+        vectorized = vectorized_evaluate(board, color)
+        if [list(x) for x in vectorized[1:]] != \
+           [list(x) for x in expected[1:]] or vectorized[0] != expected[0]:
+            return "vectorized_evaluate {} != {}".format(vectorized, expected)
+        if hstate.score(color) != expected[0]:
+            return "HeuristicState score {} != {}".format(
+                hstate.score(color), expected[0])
+    return None
+
+def check_patterns(board):
+    patterns = PatternState(board)
+    points = board.get_empty_points()
+    for color in (BLACK, WHITE):
+        hints = patterns.legality_hints(points, color)
+        for point, hint in zip(points, hints):
+            if patterns.is_eye(point, color) != board.is_eye(point, color):
+                return "pattern eye of {} at {} != is_eye".format(color, point)
+            legal = board.is_legal(point, color)
+            if (hint == LEGAL and not legal) or (hint == ILLEGAL and legal):
+                return "legality hint {} of {} at {} != is_legal {}".format(
+                    hint, color, point, legal)
+    return None
+
+def reference_solve(board):
+    from gtp_connection import negamax # gtp_connection imports this module
+    return negamax(board.copy(), TranspositionTable(board.size),
+                   HeuristicMode = False, SymmetryCheck = False)
+
+def check_solution(board, solution):
+    """
+    Check solution, (win, move) for the player to move on board,
+    against the reference search
+    """
+    expected = reference_solve(board)
+    if solution[0] != expected[0]:
+        return "solve {} != reference {}".format(solution, expected)
+    if solution[0]:
+        color = board.current_player
+        move = solution[1]
+        if not board.is_legal(move, color):
+            return "winning move {} is illegal".format(move)
+        child = board.copy()
+        child.play_move(move, color)
+        if reference_solve(child)[0]:
+            return "winning move {} loses".format(move)
+    return None
+
+def check_solve(board):
+    from gtp_connection import negamax # gtp_connection imports this module
+    solution = negamax(board.copy(), TranspositionTable(board.size))
+    return check_solution(board, solution)
+
+"""
+Checks of a single position, as (name, function)
+"""
+POSITION_CHECKS = [
+    ("legality", check_legality),
+    ("hashes", check_hashes),
+    ("evaluation", check_evaluation),
+    ("patterns", check_patterns),
+]
+
+def check_position(board, solve = True):
+    """ (name, message) of the first failed check of board, or None """
+    checks = list(POSITION_CHECKS)
+    if solve and len(board.get_empty_points()) <= SOLVE_MAX_EMPTY:
+        checks.append(("solve", check_solve))
+    for name, check in checks:
+        message = check(board)
+        if message is not None:
+            return name, message
+    return None
+
+def random_game(size, rng):
+    """ Moves of a random game, as (point, color) """
+    board = SimpleGoBoard(size)
+    moves = []
+    color = BLACK
+    while True:
+        legal = GoBoardUtil.generate_legal_moves(board, color)
+        if not legal:
+            return moves
+        point = int(rng.choice(legal))
+        board.play_move(point, color)
+        moves.append((point, color))
+        color = GoBoardUtil.opponent(color)
+
+def check_moves(size, moves, solve = True):
+    """
+    Play moves from the empty board, checking every position.
+    Returns (number of moves played, name, message) for the first
+    mismatch, or None. Illegal moves raise ValueError.
+    """
+    board = SimpleGoBoard(size)
+    hstate = HeuristicState(board)
+    mismatch = check_position(board, solve)
+    if mismatch is not None:
+        return (0,) + mismatch
+    for played, (point, color) in enumerate(moves, 1):
+        board.play_move(point, color)
+        hstate.play(point, color)
+        mismatch = check_position(board, solve)
+        if mismatch is None:
+            expected = statisticaly_evaluate(board, BLACK)[0]
+            if hstate.black_score != expected:
+                mismatch = ("incremental", "HeuristicState {} != {}".format(
+                    hstate.black_score, expected))
+            points = board.board_points
+            if mismatch is None and (hstate.patterns.codes[points]
+                                     != pattern_codes(board)[points]).any():
+                mismatch = ("incremental", "pattern codes out of date")
+        if mismatch is not None:
+            return (played,) + mismatch
+    return None
+
+def shrink(size, moves, name, solve = True):
+    """
+    Shorten moves while they still show a mismatch of the check name:
+    cut after the first mismatch, then drop single moves.
+    """
+    mismatch = check_moves(size, moves, solve)
+    moves = moves[:mismatch[0]]
+    index = len(moves) - 1
+    while index >= 0:
+        candidate = moves[:index] + moves[index + 1:]
+        try:
+            mismatch = check_moves(size, candidate, solve)
+        except ValueError: # no longer a legal sequence
+            mismatch = None
+        if mismatch is not None and mismatch[1] == name:
+            moves = candidate[:mismatch[0]]
+        index = min(index - 1, len(moves) - 1)
+    return moves
+
+class ReferenceChecker(object):
+    """
+    Sampled runtime assertions for a GtpConnection: each searched
+    position is checked with probability rate, and mismatches are
+    reported on stderr without stopping the engine. A check that takes
+    more than timelimit seconds is skipped.
+    """
+
+    def __init__(self, rate, seed = None, timelimit = CHECK_SECONDS):
+        self.rate = rate
+        self.random = random.Random(seed)
+        self.timelimit = timelimit
+        self.checks = 0
+        self.mismatches = 0
+        self.skipped = 0
+
+    def maybe_check(self, board, solution = None):
+        """ Check board, and the search result solution if given """
+        if self.rate <= 0 or self.random.random() >= self.rate:
+            return
+        # gtp_connection imports this module
+        from gtp_connection import timeout_handler
+        signal.signal(signal.SIGALRM, timeout_handler)
+        signal.setitimer(signal.ITIMER_REAL, self.timelimit)
+        try:
+            mismatch = check_position(board, solve = False)
+            if mismatch is None and solution is not None \
+               and len(board.get_empty_points()) <= SOLVE_MAX_EMPTY:
+                message = check_solution(board, solution)
+                if message is not None:
+                    mismatch = ("solve", message)
+        except TimeoutError:
+            self.skipped += 1
+            return
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        self.checks += 1
+        if mismatch is not None:
+            self.mismatches += 1
+            stderr.write("reference check {} failed: {} at {}\n".format(
+                mismatch[0], mismatch[1], position_key(board).hex()))
+            stderr.flush()
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check the optimized paths against the reference ones")
+    parser.add_argument("--size", type=int, default=4)
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-solve", action="store_true",
+                        help="do not check solve results")
+    args = parser.parse_args()
+    load_weights()
+    rng = random.Random(args.seed)
+    solve = not args.no_solve
+    failures = 0
+    for game in range(args.games):
+        moves = random_game(args.size, rng)
+        mismatch = check_moves(args.size, moves, solve)
+        if mismatch is None:
+            continue
+        failures += 1
+        played, name, message = mismatch
+        moves = shrink(args.size, moves, name, solve)
+        print("game {}: {} mismatch after {} moves: {}".format(
+            game, name, played, message))
+        print("  minimal moves: {}".format(
+            ' '.join("{}:{}".format("bw"[color - 1], point)
+                     for point, color in moves)))
+    print("{} games, {} mismatches".format(args.games, failures))
+    return failures
+
+if __name__ == '__main__':
+    exit(1 if main() else 0)
@@ -0,0 +1,97 @@
+"""
+search_stats.py
+
+Counters collected during a search, reported by the solve_stats command.
+Counters are plain attributes so that updating them in the search
+costs no more than an integer increment.
+"""
+import json
+import time
+
+class SearchStats(object):
+
+    def __init__(self):
+        self.nodes = 0 # negamax calls
+        self.tt_hits = 0
+        self.tt_misses = 0
+        self.tt_stores = 0
+        self.symmetry_hits = 0
+        self.symmetry_pruned = 0 # moves skipped as symmetric to another
+        self.etc_cutoffs = 0 # wins found by probing the children in the TT
+        self.illegal_moves = 0
+        self.eval_cache_hits = 0
+        self.eval_cache_misses = 0
+        self.max_depth = 0
+        # cutoffs[i] counts winning moves found at position i
+        # of the move order
+        self.cutoffs = []
+        self.root_move = None # root move being searched
+        self.refuted = [] # root moves proven to lose
+        self.start_time = None
+        self.end_time = None
+        self.result = None
+
+    def start(self):
+        self.start_time = time.time()
+
+    def stop(self, result = None):
+        """ Record the end of the search, and its result such as 'b a1' """
+        self.end_time = time.time()
+        if result is not None:
+            self.result = result
+
+    def cutoff(self, index):
+        """ Record a winning move found at position index of the move order """
+        while len(self.cutoffs) <= index:
+            self.cutoffs.append(0)
+        self.cutoffs[index] += 1
+
+    def seconds(self):
+        if self.start_time is None:
+            return 0.0
+        end = self.end_time
+        if end is None:
+            end = time.time()
+        return end - self.start_time
+
+    def nodes_per_second(self):
+        seconds = self.seconds()
+        if seconds == 0:
+            return 0.0
+        return self.nodes / seconds
+
+    def to_dict(self):
+        total_cutoffs = sum(self.cutoffs)
+        first_cutoffs = self.cutoffs[0] if self.cutoffs else 0
+        return {
+            "result": self.result,
+            "nodes": self.nodes,
+            "seconds": round(self.seconds(), 6),
+            "nodes_per_second": round(self.nodes_per_second(), 1),
+            "tt_hits": self.tt_hits,
+            "tt_misses": self.tt_misses,
+            "tt_stores": self.tt_stores,
+            "symmetry_hits": self.symmetry_hits,
+            "symmetry_pruned": self.symmetry_pruned,
+            "etc_cutoffs": self.etc_cutoffs,
+            "illegal_moves": self.illegal_moves,
+            "eval_cache_hits": self.eval_cache_hits,
+            "eval_cache_misses": self.eval_cache_misses,
+            "max_depth": self.max_depth,
+            "cutoffs": total_cutoffs,
+            "first_move_cutoff_rate":
+                round(first_cutoffs / total_cutoffs, 4)
+                if total_cutoffs else 0.0,
+            "cutoff_positions": list(self.cutoffs)
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+    def __str__(self):
+        lines = []
+        for key, value in self.to_dict().items():
+            if isinstance(value, list):
+                value = ' '.join(str(v) for v in value)
+            lines.append("{} {}".format(key, value))
+        return '\n'.join(lines)
@@ -0,0 +1,144 @@
+"""
+search_trace.py
+
+Binary trace of a search, to find the subtrees that take the time.
+
+negamax writes one record for every move it searches, up to a maximum
+depth: the hash of the position the move is played in, the depth, the
+move, whether it wins for the player making it, and the number of nodes
+and seconds of its subtree. Records are written in post order through a
+buffered file, so tracing only the first few plies costs little.
+
+The reader streams the file, so traces larger than memory can be read:
+    python search_trace.py TRACE [--top N]
+"""
+import argparse
+import heapq
+import struct
+from collections import defaultdict
+
+MAGIC = b"NGTR"
+
+"""
+File header: magic, format version, board size
+"""
+HEADER = struct.Struct("<4sBB")
+VERSION = 2
+
+"""
+Record: position hash, depth, move, win, subtree nodes, subtree seconds.
+The hash is the signed 64 bit transposition table code.
+"""
+RECORD = struct.Struct("<qHHBIf")
+
+_CODE_MASK = (1 << 64) - 1
+
+"""
+Moves below this depth are traced by default
+"""
+DEFAULT_MAX_DEPTH = 6
+
+"""
+Records read at once by the reader
+"""
+READ_RECORDS = 4096
+
+class TraceWriter(object):
+
+    def __init__(self, filename, size, max_depth = DEFAULT_MAX_DEPTH,
+                 buffer_size = 1 << 20):
+        self.filename = filename
+        self.max_depth = max_depth
+        self.records = 0
+        self.file = open(filename, "wb", buffering = buffer_size)
+        self.file.write(HEADER.pack(MAGIC, VERSION, size))
+
+    def record(self, code, depth, move, win, nodes, seconds):
+        self.file.write(RECORD.pack(code, depth, move, win, nodes, seconds))
+        self.records += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+def read_records(filename):
+    """
+    Board size of the trace, and an iterator over its records
+    as (code, depth, move, win, nodes, seconds)
+    """
+    tracefile = open(filename, "rb")
+    magic, version, size = HEADER.unpack(tracefile.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        tracefile.close()
+        raise ValueError("{} is not a search trace".format(filename))
+
+    def records():
+        with tracefile:
+            while True:
+                data = tracefile.read(RECORD.size * READ_RECORDS)
+                usable = len(data) - len(data) % RECORD.size
+                if usable == 0:
+                    return
+                yield from RECORD.iter_unpack(data[:usable])
+
+    return size, records()
+
+def summarize(filename, top = 10):
+    """
+    Per depth totals, and the top subtrees with the most nodes.
+    Only the top subtrees are kept in memory.
+    """
+    size, records = read_records(filename)
+    moves = defaultdict(int)
+    wins = defaultdict(int)
+    nodes = defaultdict(int)
+    seconds = defaultdict(float)
+    hottest = [] # heap of (nodes, index, record)
+    for index, record in enumerate(records):
+        code, depth, move, win, subtree_nodes, subtree_seconds = record
+        moves[depth] += 1
+        wins[depth] += win
+        nodes[depth] += subtree_nodes
+        seconds[depth] += subtree_seconds
+        item = (subtree_nodes, index, record)
+        if len(hottest) < top:
+            heapq.heappush(hottest, item)
+        elif item > hottest[0]:
+            heapq.heapreplace(hottest, item)
+    return size, moves, wins, nodes, seconds, sorted(hottest, reverse = True)
+
+def format_move(move, size):
+    """ Name of a point of a board of given size, such as c3 """
+    # gtp_connection imports this module
+    from gtp_connection import point_to_coord, format_point
+    return format_point(point_to_coord(move, size)).lower()
+
+def print_summary(filename, top):
+    size, moves, wins, nodes, seconds, hottest = summarize(filename, top)
+    print("depth  moves  wins  nodes  seconds  branching")
+    for depth in sorted(moves):
+        # moves searched below each move of this depth
+        branching = moves.get(depth + 1, 0) / moves[depth]
+        print("{:5d} {:6d} {:5d} {:6d} {:8.3f} {:10.2f}".format(
+            depth, moves[depth], wins[depth], nodes[depth], seconds[depth],
+            branching))
+    print("\nhottest subtrees")
+    print("depth  move  win  nodes  seconds  position")
+    for subtree_nodes, index, record in hottest:
+        code, depth, move, win, _, subtree_seconds = record
+        print("{:5d} {:>5} {:4d} {:6d} {:8.3f}  {:016x}".format(
+            depth, format_move(move, size), win, subtree_nodes,
+            subtree_seconds, code & _CODE_MASK))
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a search trace")
+    parser.add_argument("trace")
+    parser.add_argument("--top", type=int, default=10,
+                        help="number of hottest subtrees to list")
+    args = parser.parse_args()
+    print_summary(args.trace, args.top)
+
+if __name__ == '__main__':
+    main()
@@ -98,6 +98,7 @@ class SimpleGoBoard(object):
         self.liberty_of = np.full(self.maxpoint, NULLPOINT, dtype = np.int32)
         self._initialize_empty_points(self.board)
         self._initialize_neighbors()
+        self._initialize_neighbor_index()
 
     def copy(self):
         b = SimpleGoBoard(self.size)
@@ -144,6 +145,17 @@ class SimpleGoBoard(object):
             else:
                 self.neighbors.append(self._on_board_neighbors(point))
         
+    def _initialize_neighbor_index(self):
+        """
+        precompute numpy arrays for vectorized code.
+        board_points holds all points on the board, and row i of
+        neighbor_index holds all four neighbors of board_points[i],
+        including BORDER points.
+        """
+        self.board_points = where1d(self.board != BORDER)
+        offsets = np.array([-1, 1, -self.NS, self.NS], dtype = np.int32)
+        self.neighbor_index = self.board_points[:, None] + offsets
+
     def is_eye(self, point, color):
         """
         Check if point is a simple eye for color
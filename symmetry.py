@@ -0,0 +1,66 @@
+"""
+symmetry.py
+
+Dihedral symmetries of the board, used to prune symmetric moves.
+
+If a position is unchanged by some rotations or reflections, then moves
+that these symmetries map onto each other lead to equivalent positions,
+and only one move of each equivalence class needs to be searched.
+"""
+import numpy as np
+from board_util import coord_to_point
+
+"""
+The 8 symmetries of the square, as functions of (row, col) on a board
+of given size. The first one is the identity.
+"""
+_TRANSFORMS = [
+    lambda r, c, n: (r, c),
+    lambda r, c, n: (c, n + 1 - r),
+    lambda r, c, n: (n + 1 - r, n + 1 - c),
+    lambda r, c, n: (n + 1 - c, r),
+    lambda r, c, n: (r, n + 1 - c),
+    lambda r, c, n: (n + 1 - r, c),
+    lambda r, c, n: (c, r),
+    lambda r, c, n: (n + 1 - c, n + 1 - r),
+]
+
+_point_symmetries = {} # cache, by board size
+
+def point_symmetries(board):
+    """
+    numpy array of shape (8, board.maxpoint). Row s maps every point to
+    its image under the s-th symmetry. Border points map to themselves.
+    """
+    size = board.size
+    if size not in _point_symmetries:
+        perms = np.tile(np.arange(board.maxpoint), (len(_TRANSFORMS), 1))
+        for s, transform in enumerate(_TRANSFORMS):
+            for row in range(1, size + 1):
+                for col in range(1, size + 1):
+                    image = transform(row, col, size)
+                    perms[s, coord_to_point(row, col, size)] = \
+                        coord_to_point(image[0], image[1], size)
+        _point_symmetries[size] = perms
+    return _point_symmetries[size]
+
+def position_symmetries(board):
+    """
+    The rows of point_symmetries that map the position onto itself.
+    Always contains the identity.
+    """
+    perms = point_symmetries(board)
+    colors = board.board
+    return perms[np.all(colors[perms] == colors, axis = 1)]
+
+def unique_moves(board, moves):
+    """
+    Boolean mask over the numpy array moves, keeping one move of each
+    class of moves that the symmetries of the position map onto each
+    other: the one with the smallest point. Returns None if the position
+    has no symmetry besides the identity.
+    """
+    perms = position_symmetries(board)
+    if len(perms) == 1:
+        return None
+    return perms[:, moves].min(axis = 0) == moves
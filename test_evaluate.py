@@ -1,13 +1,27 @@
 from Nogo import Nogo
 from gtp_connection import GtpConnection
 from simple_board import SimpleGoBoard
-from board_util import GoBoardUtil
+from board_util import GoBoardUtil, BLACK, WHITE
+from heuristic import statisticaly_evaluate, vectorized_evaluate
 
 board = SimpleGoBoard(7)
 con = GtpConnection(Nogo(), board)
 
 def evaluate():
     con.evaluate([])
+    check_vectorized()
+
+def check_vectorized():
+    """
+    vectorized_evaluate must give the same score and points
+    as the scalar statisticaly_evaluate
+    """
+    for color in [BLACK, WHITE]:
+        scalar = statisticaly_evaluate(con.board, color)
+        vectorized = vectorized_evaluate(con.board, color)
+        assert scalar[0] == vectorized[0]
+        for points, vpoints in zip(scalar[1:], vectorized[1:]):
+            assert list(points) == list(vpoints)
 
 def setup():
     con.boardsize_cmd(['4'])
@@ -24,7 +38,7 @@ def setup():
     for m in moves:
         con.play_cmd(m)
     con.showboard_cmd([])
-    con.evaluate([])
+    evaluate()
     con.boardsize_cmd(['9'])
     moves = [
         ('b', 'a1'),
@@ -54,12 +68,12 @@ def setup():
     con.showboard_cmd([])
     bard = GoBoardUtil.get_twoD_board(con.board)
     print(bard)
-    con.evaluate([])
+    evaluate()
     con.play_cmd(('b', 'g2'))
     con.showboard_cmd([])
-    con.evaluate([])
+    evaluate()
     con.play_cmd(('w', 'f1'))
     con.showboard_cmd([])
-    con.evaluate([])
+    evaluate()
 
 setup()
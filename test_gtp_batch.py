@@ -0,0 +1,110 @@
+"""
+Tests of the splitting of GTP files by gtp_batch.py
+
+Run with: python -m pytest test_gtp_batch.py
+"""
+from gtp_batch import split_segments, run_segment
+
+def lines(text):
+    return [line.strip() + '\n' for line in text.strip().split('\n')]
+
+def test_segments_start_at_boardsize_and_clear_board():
+    segments = split_segments(lines("""
+        boardsize 4
+        play b a1
+        clear_board
+        # a comment
+        genmove w
+        boardsize 5
+        solve
+        """))
+    assert [commands for setup, commands in segments] == [
+        ["boardsize 4\n", "play b a1\n"],
+        ["clear_board\n", "genmove w\n"],
+        ["boardsize 5\n", "solve\n"]]
+
+def test_settings_are_replayed_in_later_segments():
+    segments = split_segments(lines("""
+        1 boardsize 4
+        timelimit 5
+        memory limit 200
+        memory trace on
+        proof_tree off
+        reference_check 0.5
+        progress stderr 2
+        ponder on
+        solve
+        clear_board
+        timelimit 2
+        memory limit 100
+        solve
+        clear_board
+        solve
+        """))
+    assert len(segments) == 3
+    assert segments[0][0] == []
+    assert segments[1][0] == [
+        "boardsize 4\n", "timelimit 5\n", "memory limit 200\n",
+        "memory trace on\n", "proof_tree off\n", "reference_check 0.5\n",
+        "progress stderr 2\n", "ponder on\n"]
+    assert segments[2][0] == [
+        "boardsize 4\n", "timelimit 2\n", "memory limit 100\n",
+        "memory trace on\n", "proof_tree off\n", "reference_check 0.5\n",
+        "progress stderr 2\n", "ponder on\n"]
+
+def test_lines_after_quit_are_dropped():
+    segments = split_segments(lines("""
+        boardsize 4
+        quit
+        clear_board
+        solve
+        """))
+    assert segments == [([], ["boardsize 4\n", "quit\n"])]
+
+def test_commands_that_cannot_be_split_keep_one_segment():
+    for command in ["time_settings 10 0 0", "time_left b 5 0",
+                    "trace /tmp/out.trace", "profile cprofile",
+                    "timers on", "proof_tree", "reference_check",
+                    "memory show", "memory", "ponder"]:
+        text = lines("""
+            boardsize 4
+            solve
+            clear_board
+            {}
+            solve
+            quit
+            clear_board
+            """.format(command))
+        segments = split_segments(text)
+        assert segments == [([], text[:-1])], command
+
+def test_split_run_gives_the_sequential_output():
+    text = lines("""
+        boardsize 4
+        timelimit 5
+        proof_tree off
+        play b a1
+        play w d4
+        play b b2
+        play w c3
+        play b a3
+        play w d2
+        solve
+        clear_board
+        proof_tree
+        play b a4
+        play w b3
+        play b c2
+        play w d1
+        play b a2
+        play w c4
+        solve
+        evaluate
+        """)
+    assert len(split_segments(text)) == 1 # proof_tree is queried
+    text.remove("proof_tree\n")
+    sequential, _ = run_segment(([], text))
+    segments = split_segments(text)
+    assert len(segments) == 2
+    split = ''.join(run_segment(segment)[0] for segment in segments)
+    assert split == sequential
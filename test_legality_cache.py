@@ -0,0 +1,55 @@
+"""
+Tests of the cached legal move lists of legality_cache.py
+
+Run with: python -m pytest test_legality_cache.py
+"""
+import random
+from board_util import GoBoardUtil, BLACK, WHITE
+from legality_cache import LegalityCache
+from reference_check import random_game
+from simple_board import SimpleGoBoard
+
+def test_moves_follow_the_position():
+    cache = LegalityCache()
+    board = SimpleGoBoard(5)
+    for point, color in random_game(5, random.Random(0)):
+        for player in (BLACK, WHITE):
+            assert cache.legal_moves(board, player) \
+                   == GoBoardUtil.generate_legal_moves(board, player)
+        board.play_move(point, color)
+    assert cache.hits == 0
+    assert cache.is_terminal(board, BLACK) \
+           == (GoBoardUtil.generate_legal_moves(board, BLACK) == [])
+
+def test_unchanged_position_hits():
+    cache = LegalityCache()
+    board = SimpleGoBoard(4)
+    moves = cache.legal_moves(board, BLACK)
+    assert cache.legal_moves(board.copy(), BLACK) == moves
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.legal_moves(board, WHITE)
+    assert (cache.hits, cache.misses) == (1, 2)
+    board.play_move(moves[0], BLACK)
+    assert moves[0] not in cache.legal_moves(board, WHITE)
+    assert (cache.hits, cache.misses) == (1, 3)
+    board.undo_move(moves[0], BLACK)
+    assert cache.legal_moves(board, BLACK) == moves
+    assert (cache.hits, cache.misses) == (2, 3)
+
+def test_ko_recapture_is_part_of_the_key():
+    cache = LegalityCache()
+    board = SimpleGoBoard(4)
+    cache.legal_moves(board, BLACK)
+    board.ko_recapture = board.pt(1, 1)
+    cache.legal_moves(board, BLACK)
+    assert (cache.hits, cache.misses) == (0, 2)
+
+def test_oldest_entry_is_dropped():
+    cache = LegalityCache(max_entries = 2)
+    boards = [SimpleGoBoard(size) for size in (3, 4, 5)]
+    for board in boards:
+        cache.legal_moves(board, BLACK)
+    assert len(cache.entries) == 2
+    cache.legal_moves(boards[2], BLACK)
+    cache.legal_moves(boards[0], BLACK)
+    assert (cache.hits, cache.misses) == (1, 4)
@@ -0,0 +1,86 @@
+"""
+Tests of negamax against the plain reference search of reference_check.py
+
+Run with: python -m pytest test_negamax.py
+"""
+import random
+import numpy as np
+from board_util import GoBoardUtil
+from gtp_connection import negamax, transposition_cutoff
+from reference_check import random_game, reference_solve, check_moves
+from search_stats import SearchStats
+from simple_board import SimpleGoBoard
+from transposition_table import TranspositionTable, TTUtil
+
+def endgame_positions(size, count, max_empty, seed = 0):
+    """ count positions of random games with at most max_empty empty points """
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        board = SimpleGoBoard(size)
+        for point, color in random_game(size, rng):
+            board.play_move(point, color)
+            if len(board.get_empty_points()) <= max_empty \
+               and rng.random() < 0.3:
+                positions.append(board.copy())
+    return positions[:count]
+
+def test_symmetric_root_entry_is_not_played():
+    # An entry kept from an earlier search of a rotated or mirrored
+    # position holds a move of that position, not of the root
+    for board in endgame_positions(4, 20, 7):
+        tt = TranspositionTable(board.size)
+        code = tt.code(board)
+        occupied = [point for point in board.board_points
+                    if board.board[point] != 0]
+        for tdb in TTUtil.symmetries(GoBoardUtil.get_twoD_board(board)):
+            symmetric = tt.code_2d(tdb, board.current_player)
+            if symmetric != code:
+                tt.store(symmetric, (True, int(occupied[0])))
+        win, move = negamax(board.copy(), tt)
+        assert win == reference_solve(board)[0]
+        if win:
+            assert board.is_legal(move, board.current_player)
+
+def test_transposition_cutoffs_match_reference():
+    # Children solved first leave proven entries that the enhanced
+    # transposition cutoffs find at the root
+    cutoffs = 0
+    for board in endgame_positions(4, 15, 8, seed = 1):
+        tt = TranspositionTable(board.size)
+        color = board.current_player
+        for move in GoBoardUtil.generate_legal_moves(board, color):
+            child = board.copy()
+            child.play_move(move, color)
+            negamax(child, tt)
+        stats = SearchStats()
+        win, move = negamax(board.copy(), tt, stats = stats)
+        cutoffs += stats.etc_cutoffs
+        assert win == reference_solve(board)[0]
+        if win:
+            assert board.is_legal(move, color)
+            child = board.copy()
+            child.play_move(move, color)
+            assert not reference_solve(child)[0]
+    assert cutoffs > 0
+
+def test_transposition_cutoff_finds_a_lost_child():
+    board = endgame_positions(5, 1, 10, seed = 2)[0]
+    tt = TranspositionTable(board.size)
+    color = board.current_player
+    moves = np.array(GoBoardUtil.generate_legal_moves(board, color))
+    state_code = tt.code(board)
+    assert transposition_cutoff(tt, state_code, moves, color) is None
+    child = board.copy()
+    child.play_move(moves[-1], color)
+    tt.store(tt.code(child), (True, 0)) # a win for the opponent
+    assert transposition_cutoff(tt, state_code, moves, color) is None
+    tt.store(tt.code(child), (False, 0))
+    assert transposition_cutoff(tt, state_code, moves, color) == moves[-1]
+
+def test_random_games_against_reference():
+    # Every position with few empty points is solved with all
+    # optimizations and compared with the plain search
+    rng = random.Random(5)
+    for _ in range(5):
+        assert check_moves(4, random_game(4, rng)) is None
@@ -0,0 +1,91 @@
+"""
+Tests of the 3x3 pattern tables and PatternState of patterns.py,
+against SimpleGoBoard and the checks of reference_check.py
+
+Run with: python -m pytest test_patterns.py
+"""
+import random
+import numpy as np
+from board_util import BLACK, WHITE
+from patterns import PatternState, pattern_codes, mover_codes, \
+                     SWAP_COLORS, NUM_PATTERNS, LEGAL, ILLEGAL
+from reference_check import random_game, check_moves, check_patterns
+from simple_board import SimpleGoBoard
+
+def random_positions(size, games, seed):
+    rng = random.Random(seed)
+    positions = []
+    for _ in range(games):
+        board = SimpleGoBoard(size)
+        for point, color in random_game(size, rng):
+            board.play_move(point, color)
+            positions.append(board.copy())
+    return positions
+
+def test_tables_match_the_board():
+    for size in range(2, 7):
+        for board in random_positions(size, 4, size):
+            assert check_patterns(board) is None
+            patterns = PatternState(board)
+            for point in board.get_empty_points():
+                for color in (BLACK, WHITE):
+                    eye = board.is_eye(point, color)
+                    surrounded = board._is_surrounded(point, color)
+                    assert patterns.is_eye(point, color) == eye
+                    assert patterns.is_surrounded(point, color) == surrounded
+                    assert patterns.is_false_eye(point, color) \
+                           == (surrounded and not eye)
+
+def test_legality_hints_are_safe():
+    for size in (3, 4, 5):
+        for board in random_positions(size, 6, 10 + size):
+            patterns = PatternState(board)
+            points = board.get_empty_points()
+            for color in (BLACK, WHITE):
+                hints = patterns.legality_hints(points, color)
+                for point, hint in zip(points, hints):
+                    if hint == LEGAL:
+                        assert board.is_legal(point, color)
+                    elif hint == ILLEGAL:
+                        assert not board.is_legal(point, color)
+
+def test_random_games_against_reference():
+    # Every position of the games, with the pattern codes and the
+    # heuristic updated move by move
+    rng = random.Random(0)
+    for size in (4, 5):
+        for _ in range(10):
+            moves = random_game(size, rng)
+            assert check_moves(size, moves, solve = False) is None
+
+def test_undo_restores_the_codes():
+    rng = random.Random(3)
+    board = SimpleGoBoard(5)
+    patterns = PatternState(board)
+    start = patterns.codes.copy()
+    moves = random_game(5, rng)
+    for point, color in moves:
+        board.play_move(point, color)
+        patterns.play(point, color)
+    points = board.board_points
+    assert (patterns.codes[points] == pattern_codes(board)[points]).all()
+    for point, color in reversed(moves):
+        board.undo_move(point, color)
+        patterns.undo(point, color)
+    assert (patterns.codes == start).all()
+
+def test_mover_codes():
+    codes = np.arange(NUM_PATTERNS)
+    assert (SWAP_COLORS[SWAP_COLORS] == codes).all()
+    board = SimpleGoBoard(4)
+    for point, color in random_game(4, random.Random(4))[:6]:
+        board.play_move(point, color)
+    swapped = board.copy()
+    stones = swapped.board[swapped.board_points]
+    swapped.board[swapped.board_points] = np.where(
+        stones == BLACK, WHITE, np.where(stones == WHITE, BLACK, stones))
+    points = board.board_points
+    assert (mover_codes(pattern_codes(board)[points], WHITE)
+            == pattern_codes(swapped)[points]).all()
+    assert (mover_codes(pattern_codes(board)[points], BLACK)
+            == pattern_codes(board)[points]).all()
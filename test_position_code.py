@@ -0,0 +1,72 @@
+"""
+Round trip tests of position_code.py, on random positions of all sizes
+
+Run with: python -m pytest test_position_code.py
+"""
+import random
+from board_util import GoBoardUtil, BLACK, WHITE
+from position_code import encode, decode, encode_2d, decode_2d, \
+                          position_key, decode_key, POINTS_PER_BYTE
+from reference_check import random_game
+from simple_board import SimpleGoBoard
+
+SIZES = range(2, 8)
+
+def random_positions(size, rng, games = 5):
+    """ Every position of a few random games, the empty board included """
+    board = SimpleGoBoard(size)
+    positions = [board.copy()]
+    for _ in range(games):
+        board = SimpleGoBoard(size)
+        for point, color in random_game(size, rng):
+            board.play_move(point, color)
+            positions.append(board.copy())
+    return positions
+
+def test_code_length():
+    for size in SIZES:
+        points = size * size
+        expected = (points + POINTS_PER_BYTE - 1) // POINTS_PER_BYTE
+        assert len(encode(SimpleGoBoard(size))) == expected
+
+def test_encode_decode():
+    rng = random.Random(0)
+    for size in SIZES:
+        for board in random_positions(size, rng):
+            decoded = decode(encode(board), size)
+            assert (decoded.board == board.board).all()
+            assert decoded.current_player == BLACK
+
+def test_encode_2d_decode_2d():
+    rng = random.Random(1)
+    for size in SIZES:
+        for board in random_positions(size, rng):
+            board2d = GoBoardUtil.get_twoD_board(board)
+            code = encode_2d(board2d)
+            assert code == encode(board)
+            assert (decode_2d(code, size) == board2d).all()
+
+def test_position_key_decode_key():
+    rng = random.Random(2)
+    for size in SIZES:
+        for board in random_positions(size, rng):
+            for player in (BLACK, WHITE):
+                board.current_player = player
+                decoded = decode_key(position_key(board), size)
+                assert (decoded.board == board.board).all()
+                assert decoded.current_player == player
+
+def test_distinct_positions_have_distinct_codes():
+    # The padding of the last byte must not hide the last points
+    for size in SIZES:
+        board = SimpleGoBoard(size)
+        codes = {encode(board)}
+        for point in board.board_points:
+            for color in (BLACK, WHITE):
+                other = board.copy()
+                other.board[point] = color
+                codes.add(encode(other))
+        assert len(codes) == 1 + 2 * size * size
+        key = position_key(board)
+        board.current_player = WHITE
+        assert position_key(board) != key
@@ -0,0 +1,27 @@
+"""
+Tests of the function timers of profiling.py
+
+Run with: python -m pytest test_profiling.py
+"""
+from profiling import FunctionTimers
+from simple_board import SimpleGoBoard
+
+def calls(timers):
+    return timers.totals["SimpleGoBoard.get_empty_points"][0]
+
+def test_timers_of_two_sessions():
+    original = SimpleGoBoard.__dict__["get_empty_points"]
+    board = SimpleGoBoard(4)
+    first, second = FunctionTimers(), FunctionTimers()
+    first.enable()
+    first.enable()
+    second.enable()
+    board.get_empty_points()
+    assert calls(first) == 1 and calls(second) == 1
+    first.disable()
+    board.get_empty_points()
+    assert calls(first) == 1 and calls(second) == 2
+    assert SimpleGoBoard.__dict__["get_empty_points"] is not original
+    second.disable()
+    second.disable()
+    assert SimpleGoBoard.__dict__["get_empty_points"] is original
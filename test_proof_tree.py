@@ -0,0 +1,84 @@
+"""
+Tests of the winning moves kept across the game by proof_tree.py
+
+Run with: python -m pytest test_proof_tree.py
+"""
+import time
+from board_util import GoBoardUtil, BLACK
+from gtp_connection import negamax
+from proof_tree import ProofTree
+from reference_check import reference_solve
+from simple_board import SimpleGoBoard
+from transposition_table import TranspositionTable
+
+def won_position(size = 3):
+    """ The board after our winning first move, and the table proving it """
+    board = SimpleGoBoard(size)
+    tt = TranspositionTable(size)
+    win, move = negamax(board.copy(), tt)
+    assert win
+    board.play_move(move, BLACK)
+    return board, tt
+
+def test_lookup_after_every_answer():
+    board, tt = won_position()
+    tree = ProofTree()
+    tree.extend(board, tt)
+    answers = GoBoardUtil.generate_legal_moves(board, board.current_player)
+    assert len(tree.moves) == len(answers)
+    for answer in answers:
+        child = board.copy()
+        child.play_move(answer, child.current_player)
+        move = tree.lookup(child)
+        assert child.is_legal(move, child.current_player)
+        child.play_move(move, child.current_player)
+        assert not reference_solve(child)[0]
+    assert tree.hits == len(answers)
+
+def test_game_played_from_the_tree():
+    board, tt = won_position()
+    tree = ProofTree()
+    while True:
+        tree.extend(board, tt)
+        answers = GoBoardUtil.generate_legal_moves(board, board.current_player)
+        if not answers:
+            break # the opponent lost
+        board.play_move(answers[-1], board.current_player)
+        move = tree.lookup(board)
+        assert move is not None
+        board.play_move(move, board.current_player)
+
+def test_position_outside_the_tree():
+    board, tt = won_position()
+    tree = ProofTree()
+    tree.extend(board, tt)
+    # the opponent passed, so it is not an answer in the tree
+    board.current_player = BLACK
+    assert tree.lookup(board) is None
+    other = SimpleGoBoard(3)
+    first = [point for point in other.get_empty_points()
+             if board.board[point] == 0][0]
+    other.play_move(first, BLACK)
+    other.play_move(other.get_empty_points()[0], other.current_player)
+    assert tree.lookup(other) is None
+    assert tree.hits == 0
+
+def test_size_clear_disabled_and_deadline():
+    board, tt = won_position()
+    answer = GoBoardUtil.generate_legal_moves(board, board.current_player)[0]
+    child = board.copy()
+    child.play_move(answer, child.current_player)
+    tree = ProofTree()
+    tree.extend(board, tt)
+    assert tree.lookup(child) is not None
+    tree.enabled = False
+    assert tree.lookup(child) is None
+    tree.enabled = True
+    # a tree of another board size is dropped on extend
+    other, other_tt = won_position(2)
+    tree.extend(other, other_tt)
+    assert tree.size == 2 and tree.lookup(child) is None
+    tree.clear()
+    assert tree.moves == {} and tree.lookup(child) is None
+    tree.extend(board, tt, deadline = time.time() - 1)
+    assert tree.lookup(child) is None
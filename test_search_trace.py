@@ -0,0 +1,87 @@
+"""
+Tests of writing and reading back the search traces of search_trace.py
+
+Run with: python -m pytest test_search_trace.py
+"""
+import pytest
+from gtp_connection import negamax
+from search_stats import SearchStats
+from search_trace import TraceWriter, read_records, summarize, \
+                         print_summary, format_move
+from simple_board import SimpleGoBoard
+from transposition_table import TranspositionTable
+
+RECORDS = [(-5, 0, 7, 1, 100, 0.5),
+           (1 << 40, 1, 8, 0, 30, 0.25),
+           (3, 300, 9, 1, 2, 0.125),
+           (-1, 1, 12, 0, 60, 1.0)]
+
+def write_trace(filename, size, records):
+    writer = TraceWriter(str(filename), size)
+    for record in records:
+        writer.record(*record)
+    writer.close()
+    return writer
+
+def test_records_round_trip(tmp_path):
+    filename = tmp_path / "trace"
+    writer = write_trace(filename, 5, RECORDS)
+    assert writer.records == len(RECORDS)
+    size, records = read_records(str(filename))
+    assert size == 5
+    assert list(records) == RECORDS
+
+def test_partial_record_is_ignored(tmp_path):
+    filename = tmp_path / "trace"
+    write_trace(filename, 5, RECORDS)
+    with open(str(filename), "ab") as tracefile:
+        tracefile.write(b"\0\0\0")
+    assert list(read_records(str(filename))[1]) == RECORDS
+
+def test_not_a_trace(tmp_path):
+    filename = tmp_path / "trace"
+    filename.write_bytes(b"NGTX\2\5")
+    with pytest.raises(ValueError):
+        read_records(str(filename))
+
+def test_summarize(tmp_path):
+    filename = tmp_path / "trace"
+    write_trace(filename, 5, RECORDS)
+    size, moves, wins, nodes, seconds, hottest = summarize(str(filename), 2)
+    assert size == 5
+    assert dict(moves) == {0: 1, 1: 2, 300: 1}
+    assert dict(wins) == {0: 1, 1: 0, 300: 1}
+    assert dict(nodes) == {0: 100, 1: 90, 300: 2}
+    assert seconds[1] == 1.25
+    assert [record for _, _, record in hottest] == [RECORDS[0], RECORDS[3]]
+
+def test_print_summary(tmp_path, capsys):
+    filename = tmp_path / "trace"
+    write_trace(filename, 5, RECORDS)
+    print_summary(str(filename), 4)
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split() == ["depth", "moves", "wins", "nodes", "seconds",
+                                "branching"]
+    assert lines[1].split() == ["0", "1", "1", "100", "0.500", "2.00"]
+    assert lines[3].split()[0] == "300"
+    hottest = lines[lines.index("hottest subtrees") + 2:]
+    assert hottest[0].split() == ["0", format_move(7, 5), "1", "100",
+                                  "0.500", "fffffffffffffffb"]
+    assert hottest[1].split()[-1] == "ffffffffffffffff"
+    assert hottest[2].split()[-1] == "0000010000000000"
+
+def test_trace_of_a_search(tmp_path):
+    filename = tmp_path / "trace"
+    board = SimpleGoBoard(3)
+    writer = TraceWriter(str(filename), board.size, max_depth = 2)
+    stats = SearchStats()
+    win = negamax(board, TranspositionTable(board.size), stats = stats,
+                  tracer = writer)[0]
+    writer.close()
+    size, moves, wins, nodes, seconds, hottest = summarize(str(filename))
+    assert size == 3
+    assert set(moves) == {0, 1}
+    assert sum(moves.values()) == writer.records
+    assert nodes[0] <= stats.nodes
+    # the first player wins on 3x3, the last move searched at the root wins
+    assert win and wins[0] >= 1
@@ -0,0 +1,79 @@
+"""
+Tests of the game clock arithmetic of time_manager.py
+
+Run with: python -m pytest test_time_manager.py
+"""
+import io
+import random
+from board_util import BLACK, WHITE
+from gtp_connection import GtpConnection
+from Nogo import Nogo
+from reference_check import random_game
+from simple_board import SimpleGoBoard
+from time_manager import TimeManager, MIN_BUDGET, SAFETY_MARGIN
+
+def boards(size = 7):
+    """ The positions of a random game, from the empty board """
+    board = SimpleGoBoard(size)
+    positions = [board.copy()]
+    for point, color in random_game(size, random.Random(0)):
+        board.play_move(point, color)
+        positions.append(board.copy())
+    return positions
+
+def test_budget_bounds():
+    for settings in [(60, 0, 0), (10, 5, 5), (0.1, 0, 0), (0, 10, 2),
+                     (1, 30, 10)]:
+        manager = TimeManager()
+        manager.set_time_settings(*settings)
+        main_time, byo_yomi_time, byo_yomi_stones = settings
+        byo_yomi = byo_yomi_time / byo_yomi_stones if byo_yomi_stones else 0
+        for seconds, stones in [(main_time, 0), (0.3, 0), (0.0, 0),
+                                (byo_yomi_time, byo_yomi_stones)]:
+            manager.set_time_left(BLACK, seconds, stones)
+            for board in boards():
+                budget = manager.budget(board, BLACK)
+                assert budget >= MIN_BUDGET
+                if stones > 0:
+                    limit = seconds - SAFETY_MARGIN
+                else:
+                    limit = seconds + byo_yomi - SAFETY_MARGIN
+                assert budget <= max(limit, MIN_BUDGET)
+
+def test_main_time_runs_into_byo_yomi():
+    manager = TimeManager()
+    manager.set_time_settings(10, 30, 5)
+    manager.used(BLACK, 4)
+    assert manager.clock[BLACK] == (6, 0)
+    manager.used(BLACK, 8)
+    assert manager.clock[BLACK] == (28, 5)
+    assert manager.clock[WHITE] == (10, 0)
+
+def test_byo_yomi_period_resets():
+    manager = TimeManager()
+    manager.set_time_settings(0, 30, 3)
+    manager.set_time_left(WHITE, 30, 3)
+    manager.used(WHITE, 10)
+    manager.used(WHITE, 5)
+    assert manager.clock[WHITE] == (15, 1)
+    manager.used(WHITE, 5)
+    assert manager.clock[WHITE] == (30, 3)
+
+def test_main_time_without_byo_yomi_stops_at_zero():
+    manager = TimeManager()
+    manager.set_time_settings(5, 0, 0)
+    manager.used(BLACK, 7)
+    assert manager.clock[BLACK] == (0.0, 0)
+    assert manager.budget(SimpleGoBoard(5), BLACK) == MIN_BUDGET
+
+def test_byo_yomi_without_stones_means_no_limit():
+    manager = TimeManager()
+    manager.set_time_settings(10, 5, 5)
+    assert manager.active()
+    manager.set_time_settings(0, 5, 0)
+    assert not manager.active()
+    con = GtpConnection(Nogo(), SimpleGoBoard(5))
+    con.outfile = io.StringIO()
+    con.get_cmd("time_settings 0 5 0")
+    assert con.outfile.getvalue().startswith("=")
+    assert not con.time_manager.active()
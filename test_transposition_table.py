@@ -0,0 +1,54 @@
+"""
+Tests of the entry limit and eviction of transposition_table.py
+
+Run with: python -m pytest test_transposition_table.py
+"""
+import random
+from board_util import GoBoardUtil
+from gtp_connection import negamax
+from reference_check import random_game, reference_solve
+from simple_board import SimpleGoBoard
+from transposition_table import TranspositionTable
+
+def test_table_stays_under_max_entries():
+    tt = TranspositionTable(4)
+    tt.max_entries = 8
+    for code in range(100):
+        tt.store(code, (True, code))
+        assert len(tt.table) <= tt.max_entries
+        assert tt.lookup(code) == (True, code)
+    # Every entry stored past the first 8 pushes an older one out
+    assert tt.evictions == 100 - 8
+    assert sorted(tt.table) == list(range(92, 100))
+
+def test_oldest_entries_are_evicted_first():
+    tt = TranspositionTable(4)
+    tt.max_entries = 4
+    for code in range(4):
+        tt.store(code, (False, 0))
+    tt.store(4, (True, 0))
+    assert tt.evictions == 1
+    assert tt.lookup(0) is None
+    assert [tt.lookup(code) for code in range(1, 5)] \
+           == [(False, 0)] * 3 + [(True, 0)]
+
+def test_no_limit_by_default():
+    tt = TranspositionTable(4)
+    for code in range(1000):
+        tt.store(code, (True, 0))
+    assert len(tt.table) == 1000 and tt.evictions == 0
+
+def test_search_with_a_small_table():
+    rng = random.Random(0)
+    for _ in range(5):
+        board = SimpleGoBoard(4)
+        for point, color in random_game(4, rng)[:6]:
+            board.play_move(point, color)
+        tt = TranspositionTable(4)
+        tt.max_entries = 16
+        win, move = negamax(board.copy(), tt)
+        assert len(tt.table) <= tt.max_entries
+        assert win == reference_solve(board)[0]
+        if win:
+            assert move in GoBoardUtil.generate_legal_moves(
+                board, board.current_player)
@@ -0,0 +1,111 @@
+"""
+time_manager.py
+
+Game clock handling for genmove, set by the GTP time_settings and
+time_left commands.
+
+Without time_settings every search gets the fixed time limit of the
+timelimit command. With a game clock, each move gets a budget in
+fractional seconds: the remaining time shared over the moves we still
+expect to play, with less time in the opening, where the game cannot be
+solved anyway, and more in the midgame, where a solve starts to become
+possible. A search that proves the result stops early by itself.
+The budget always leaves a safety margin on the clock.
+"""
+from board_util import BLACK, WHITE
+
+"""
+Seconds kept on the clock for the GTP round trip
+"""
+SAFETY_MARGIN = 0.2
+
+"""
+Smallest budget given to a search
+"""
+MIN_BUDGET = 0.05
+
+"""
+Budget factors by stage of the game, as the fraction of empty points:
+opening above OPENING_EMPTY, midgame above ENDGAME_EMPTY
+"""
+OPENING_EMPTY = 0.75
+ENDGAME_EMPTY = 0.35
+OPENING_FACTOR = 0.5
+MIDGAME_FACTOR = 2.0
+ENDGAME_FACTOR = 1.0
+
+"""
+Most of the remaining main time spent on one move
+"""
+MAX_MAIN_TIME_FRACTION = 0.5
+
+class TimeManager(object):
+
+    def __init__(self):
+        self.main_time = None # None when there is no game clock
+        self.byo_yomi_time = 0.0
+        self.byo_yomi_stones = 0
+        # color -> (seconds left, stones left in the byo-yomi period),
+        # stones is 0 in main time
+        self.clock = {}
+
+    def set_time_settings(self, main_time, byo_yomi_time, byo_yomi_stones):
+        """
+        As in GTP: byo_yomi_time > 0 with byo_yomi_stones == 0
+        means no time limit
+        """
+        if byo_yomi_time > 0 and byo_yomi_stones == 0:
+            self.main_time = None
+            self.clock = {}
+            return
+        self.main_time = main_time
+        self.byo_yomi_time = byo_yomi_time
+        self.byo_yomi_stones = byo_yomi_stones
+        self.clock = {BLACK: (main_time, 0), WHITE: (main_time, 0)}
+
+    def set_time_left(self, color, seconds, stones):
+        self.clock[color] = (seconds, stones)
+
+    def active(self):
+        return self.main_time is not None
+
+    def budget(self, board, color):
+        """ Seconds to spend on the move of color on board """
+        seconds, stones = self.clock.get(color, (self.main_time, 0))
+        if stones > 0: # byo-yomi: share the period over its stones
+            return max(seconds / stones - SAFETY_MARGIN, MIN_BUDGET)
+        empty = len(board.get_empty_points())
+        moves_left = max(empty // 2, 1)
+        byo_yomi = 0.0
+        if self.byo_yomi_stones > 0:
+            byo_yomi = self.byo_yomi_time / self.byo_yomi_stones
+        budget = seconds / moves_left * self.stage_factor(board, empty)
+        budget = min(budget, seconds * MAX_MAIN_TIME_FRACTION) + byo_yomi
+        limit = seconds + byo_yomi - SAFETY_MARGIN
+        return max(min(budget, limit), MIN_BUDGET)
+
+    def stage_factor(self, board, empty):
+        fraction = empty / (board.size * board.size)
+        if fraction > OPENING_EMPTY:
+            return OPENING_FACTOR
+        if fraction > ENDGAME_EMPTY:
+            return MIDGAME_FACTOR
+        return ENDGAME_FACTOR
+
+    def used(self, color, elapsed):
+        """
+        Charge elapsed seconds to the clock of color,
+        in case the controller does not send time_left
+        """
+        if color not in self.clock:
+            return
+        seconds, stones = self.clock[color]
+        seconds -= elapsed
+        if stones > 0:
+            stones -= 1
+            if stones == 0: # new byo-yomi period
+                seconds, stones = self.byo_yomi_time, self.byo_yomi_stones
+        elif seconds <= 0 and self.byo_yomi_stones > 0:
+            seconds, stones = self.byo_yomi_time + seconds, \
+                              self.byo_yomi_stones
+        self.clock[color] = (max(seconds, 0.0), stones)
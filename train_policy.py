@@ -0,0 +1,215 @@
+"""
+train_policy.py
+
+Learns a move ordering policy for negamax from solved positions.
+
+Positions are taken from seeded random games, stopped when few empty
+points are left so that every position can be solved exactly. Each
+legal move of the player to move is labeled by solving the position
+after it: a move is a winning move when the opponent loses there.
+Only positions with both winning and losing moves teach something
+about ordering.
+
+The policy gives each 3x3 pattern code, seen by the player to move
+(see patterns.mover_codes), the weight log((wins + 1) / (losses + 1))
+of the moves played in it. negamax adds the weights to the heuristic
+scores before sorting the moves.
+
+The positions are split into training, validation and test sets.
+The weights are scaled by each candidate scale, the validation
+positions are solved with each, and the scale with the fewest nodes is
+kept. The test positions are only solved at the end: the policy is
+written to pattern_policy.npy, which Nogo.py loads at startup, only if
+it solves them with fewer nodes than the heuristic alone.
+
+Usage:
+    python train_policy.py [--size N] [--positions N] [--max-empty N]
+                           [--validation FRACTION] [--holdout FRACTION]
+                           [--seed N] [--force]
+"""
+import argparse
+import random
+import signal
+import numpy as np
+from board_util import GoBoardUtil
+from transposition_table import TranspositionTable
+from gtp_connection import negamax, timeout_handler
+from heuristic import load_weights
+from patterns import NUM_PATTERNS, POLICY_FILE, pattern_codes, \
+                     mover_codes, set_policy
+from reference_check import random_game
+from tune_weights import make_board, measure, wrong_answers
+
+"""
+Scales of the weights tried on the validation positions
+"""
+SCALES = [0.5, 1, 2, 4, 8]
+
+def random_positions(size, count, min_empty, max_empty, rng):
+    """
+    count positions of random games with min_empty to max_empty
+    empty points, as (name, size, moves) like tune_weights.load_positions
+    """
+    positions = []
+    while len(positions) < count:
+        moves = [(color, point) for point, color in random_game(size, rng)]
+        # A move fills one point, and captures are illegal
+        played = [n for n in range(len(moves) + 1)
+                  if min_empty <= size * size - n <= max_empty]
+        if not played:
+            continue
+        n = rng.choice(played)
+        name = "random:{}".format(len(positions))
+        positions.append((name, size, moves[:n]))
+    return positions
+
+def label_moves(board, tt, timelimit):
+    """
+    Legal moves of the player to move on board, and for each whether
+    it wins. Returns None if a move could not be solved in timelimit.
+    """
+    color = board.current_player
+    moves = GoBoardUtil.generate_legal_moves(board, color)
+    wins = []
+    signal.signal(signal.SIGALRM, timeout_handler)
+    signal.setitimer(signal.ITIMER_REAL, timelimit)
+    try:
+        for move in moves:
+            child = board.copy()
+            child.play_move(move, color)
+            wins.append(not negamax(child, tt)[0])
+    except TimeoutError:
+        return None
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+    return moves, wins
+
+def count_patterns(positions, timelimit):
+    """
+    Winning and losing moves of every mover pattern code, as two numpy
+    arrays of size NUM_PATTERNS, and the number of positions used
+    """
+    wins = np.zeros(NUM_PATTERNS, dtype = np.int64)
+    losses = np.zeros(NUM_PATTERNS, dtype = np.int64)
+    used = 0
+    tables = {}
+    for name, size, moves in positions:
+        board = make_board(size, moves)
+        if size not in tables:
+            tables[size] = TranspositionTable(size)
+        labels = label_moves(board, tables[size], timelimit)
+        if labels is None or len(set(labels[1])) < 2:
+            continue
+        used += 1
+        legal, won = labels
+        codes = mover_codes(pattern_codes(board)[legal],
+                            board.current_player)
+        won = np.array(won)
+        np.add.at(wins, codes[won], 1)
+        np.add.at(losses, codes[~won], 1)
+    return wins, losses, used
+
+def policy_weights(wins, losses):
+    """ Log odds of a win of the moves of each pattern code """
+    return np.log((wins + 1) / (losses + 1)).astype(np.float32)
+
+def compare(weights, positions, timelimit, name):
+    """
+    Solve positions without a policy and with weights.
+    Returns (baseline nodes, nodes with weights), or None if the
+    weights give a wrong answer.
+    """
+    set_policy(None)
+    solved, baseline, seconds, answers = measure(positions, timelimit)
+    print("{} heuristic only: solved {} nodes {} time {:.2f}".format(
+        name, solved, baseline, seconds))
+    set_policy(weights)
+    solved, nodes, seconds, policy_answers = measure(positions, timelimit)
+    set_policy(None)
+    print("{} policy: solved {} nodes {} time {:.2f}".format(
+        name, solved, nodes, seconds))
+    if wrong_answers(policy_answers, answers):
+        print("{}: wrong answers, rejected".format(name))
+        return None
+    return baseline, nodes
+
+def select_scale(weights, positions, timelimit):
+    """
+    The scale of weights that solves positions with the fewest nodes,
+    or None if every scale gives a wrong answer
+    """
+    set_policy(None)
+    solved, baseline, seconds, answers = measure(positions, timelimit)
+    print("validation heuristic only: solved {} nodes {} time {:.2f}".format(
+        solved, baseline, seconds))
+    best = None
+    for scale in SCALES:
+        set_policy(weights * scale)
+        solved, nodes, seconds, scaled = measure(positions, timelimit)
+        print("validation scale {}: solved {} nodes {} time {:.2f}".format(
+            scale, solved, nodes, seconds))
+        if wrong_answers(scaled, answers):
+            print("scale {}: wrong answers, rejected".format(scale))
+            continue
+        if best is None or nodes < best[1]:
+            best = (scale, nodes)
+    set_policy(None)
+    return None if best is None else best[0]
+
+def split_positions(positions, validation, holdout):
+    """ (train, validation, test) sets, given the fractions of the last two """
+    test = int(len(positions) * holdout)
+    valid = int(len(positions) * validation)
+    return (positions[test + valid:], positions[test:test + valid],
+            positions[:test])
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Learn pattern weights for move ordering")
+    parser.add_argument("--size", type=int, default=5)
+    parser.add_argument("--positions", type=int, default=300)
+    parser.add_argument("--min-empty", type=int, default=6)
+    parser.add_argument("--max-empty", type=int, default=11)
+    parser.add_argument("--validation", type=float, default=0.2,
+                        help="fraction of the positions to choose the scale")
+    parser.add_argument("--holdout", type=float, default=0.2,
+                        help="fraction of the positions held out for testing")
+    parser.add_argument("--timelimit", type=float, default=30,
+                        help="seconds per position")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=POLICY_FILE)
+    parser.add_argument("--force", action="store_true",
+                        help="write the policy even if it does not help")
+    args = parser.parse_args()
+    load_weights()
+
+    rng = random.Random(args.seed)
+    positions = random_positions(args.size, args.positions,
+                                 args.min_empty, args.max_empty, rng)
+    train, validation, test = split_positions(positions, args.validation,
+                                              args.holdout)
+    wins, losses, used = count_patterns(train, args.timelimit)
+    print("{} training positions, {} with both winning and losing moves, "
+          "{} patterns seen".format(len(train), used,
+                                    np.count_nonzero(wins + losses)))
+    weights = policy_weights(wins, losses)
+    scale = select_scale(weights, validation, args.timelimit)
+    if scale is None:
+        print("Every scale gives wrong answers, not written")
+        return
+    result = compare(weights * scale, test, args.timelimit,
+                     "test scale {}".format(scale))
+    if result is None:
+        print("The policy gives wrong answers, not written")
+        return
+    baseline, nodes = result
+    print("scale {}: test nodes {} against {} ({:+.1%})".format(
+        scale, nodes, baseline, nodes / baseline - 1 if baseline else 0.0))
+    if nodes >= baseline and not args.force:
+        print("The policy does not reduce the nodes, not written")
+        return
+    np.save(args.output, weights * scale)
+    print("Policy written to {}".format(args.output))
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,8 @@
 import random
+import sys
+from itertools import islice
 import numpy as np
-from board_util import EMPTY, BORDER
+from board_util import EMPTY, BORDER, BLACK, WHITE
 
 
 class TranspositionTable:
@@ -16,18 +18,39 @@ class TranspositionTable:
     taking the random integer for that position, multiplying it by the
     integer value of the piece at that position, and xor with the previous
     code value. 
+
+    One more random integer is xored in when white is to play, so that
+    the table stays correct when it is kept across searches.
+
+    If max_entries is set, the oldest entries are evicted when the table
+    is full. Entries are proven results, so evicting them only costs
+    searching these positions again.
     """
     # MAX_ZOBRIST_RANDOM = 1073741823
     MAX_ZOBRIST_RANDOM = 4611686018427387903    
 
+    # Fraction of the entries evicted when the table is full
+    EVICT_FRACTION = 0.25
+
     def __init__(self, size):
         self.table = {}
         self.board_size = size
+        self.max_entries = None
+        self.evictions = 0
         self.zobrist_table = np.zeros(shape=(size, size), dtype=np.int64)
         for i in range(size):
             for j in range(size):
                 self.zobrist_table[i, j] = random.randint(
                     0, TranspositionTable.MAX_ZOBRIST_RANDOM)
+        self.white_to_play = random.randint(
+            0, TranspositionTable.MAX_ZOBRIST_RANDOM)
+        # zobrist_table indexed by board point, 0 for border points
+        NS = size + 1
+        self.point_zobrist = np.zeros(size * size + 3 * NS, dtype = np.int64)
+        for i in range(size):
+            for j in range(size):
+                self.point_zobrist[(i + 1) * NS + j + 1] = \
+                    self.zobrist_table[i, j]
 
     def code(self, board):
         c = 0
@@ -37,17 +60,29 @@ class TranspositionTable:
                 color = board.get_color(point)
                 if color is not EMPTY and color is not BORDER:
                     c = c ^ (self.zobrist_table[i, j] * color)
+        if board.current_player == WHITE:
+            c = c ^ self.white_to_play
         return c
 
-    def code_2d(self, board2d):
+    def code_2d(self, board2d, current_player = BLACK):
         c = 0
         for i in range(len(board2d)):
             for j in range(len(board2d)):
                 color = board2d[i, j]
                 if color is not EMPTY and color is not BORDER:
                     c = c ^ (self.zobrist_table[i, j] * color)
+        if current_player == WHITE:
+            c = c ^ self.white_to_play
         return c
 
+    def child_codes(self, code, points, color):
+        """
+        Codes of the positions after color plays on each of the empty
+        points, a numpy array, given the code of the position.
+        The player to move changes, so white_to_play is toggled.
+        """
+        return (code ^ self.white_to_play) ^ (self.point_zobrist[points] * color)
+
     def lookup(self, code):
         if code in self.table:
             return self.table[code]
@@ -55,9 +90,31 @@ class TranspositionTable:
             return None
 
     def store(self, code, data):
+        if self.max_entries is not None \
+           and len(self.table) >= self.max_entries:
+            self.evict()
         self.table[code] = data
         return data
 
+    def evict(self):
+        """ Remove the oldest entries, in insertion order """
+        n = max(int(len(self.table) * self.EVICT_FRACTION), 1)
+        for code in list(islice(self.table, n)):
+            del self.table[code]
+        self.evictions += n
+
+    def entry_bytes(self):
+        """ Estimated bytes per entry: the code, the result and the dict slot """
+        entry = next(iter(self.table.items()), (np.int64(0), (False, 0)))
+        slot = sys.getsizeof(self.table) / max(len(self.table), 1)
+        return sys.getsizeof(entry[0]) + sys.getsizeof(entry[1]) + slot
+
+    def memory_bytes(self):
+        """ Estimated bytes held by the table """
+        if not self.table:
+            return sys.getsizeof(self.table)
+        return int(self.entry_bytes() * len(self.table))
+
 class TTUtil(object):
     @staticmethod
     def symmetries(twoD_array):
@@ -0,0 +1,203 @@
+"""
+tune_weights.py
+
+Tunes the heuristic weights of heuristic.py for solver speed.
+The weights are only used for move ordering in negamax, so a better
+weight set solves the same positions with fewer nodes.
+
+All solve positions of the given GTP files are replayed under each
+candidate weight set, counting nodes and wall time. A weight set that
+gives a different answer than the default weights on any position is
+rejected. The best weight set is written to heuristic_weights.json,
+which Nogo.py loads at startup.
+
+Usage:
+    python tune_weights.py [gtp files] [--timelimit SECONDS] [--max-weight N]
+"""
+import argparse
+import json
+import math
+import re
+import signal
+import time
+from board_util import coord_to_point
+from simple_board import SimpleGoBoard
+from transposition_table import TranspositionTable
+from search_stats import SearchStats
+from gtp_connection import negamax, timeout_handler, move_to_coord, \
+                           color_to_int
+import heuristic
+
+DEFAULT_FILES = ["assignment2-public-tests.gtp", "a2-sample.gtp"]
+
+def load_positions(filenames):
+    """
+    Collect the positions of all solve commands in the GTP files.
+    Returns a list of (name, size, moves), where moves is a list of
+    (color, point). Positions after a genmove are skipped until the next
+    clear_board, since the generated move is not known.
+    """
+    positions = []
+    for filename in filenames:
+        size = 7
+        moves = []
+        known = True
+        with open(filename) as f:
+            for line in f:
+                line = line.strip()
+                if not line or line[0] == '#':
+                    continue
+                number = ''
+                if line[0].isdigit():
+                    number = re.match(r"^\d+", line).group()
+                    line = line[len(number):].lstrip()
+                elements = line.split()
+                command = elements[0]
+                if command == "boardsize":
+                    size = int(elements[1])
+                    moves = []
+                    known = True
+                elif command == "clear_board":
+                    moves = []
+                    known = True
+                elif command == "play":
+                    row, col = move_to_coord(elements[2], size)
+                    moves.append((color_to_int(elements[1].lower()),
+                                  coord_to_point(row, col, size)))
+                elif command == "genmove":
+                    known = False
+                elif command == "solve" and known:
+                    name = "{}:{}".format(filename, number)
+                    positions.append((name, size, list(moves)))
+    return positions
+
+def make_board(size, moves):
+    board = SimpleGoBoard(size)
+    for color, point in moves:
+        board.play_move(point, color)
+    return board
+
+def solve_position(size, moves, timelimit):
+    """
+    Solve one position with the current weights.
+    Returns (solved, nodes, seconds, win), where win is None if the
+    position was not solved.
+    """
+    board = make_board(size, moves)
+    tt = TranspositionTable(size)
+    stats = SearchStats()
+    signal.signal(signal.SIGALRM, timeout_handler)
+    signal.setitimer(signal.ITIMER_REAL, timelimit)
+    start = time.time()
+    win = None
+    try:
+        win = negamax(board, tt, stats = stats)[0]
+    except TimeoutError:
+        pass
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+    return win is not None, stats.nodes, time.time() - start, win
+
+def measure(positions, timelimit):
+    """
+    Solve all positions with the current weights.
+    Unsolved positions count with their partial node count and
+    the full timelimit.
+    Returns (solved, nodes, seconds) totals, and the list of the
+    answers, None for unsolved positions.
+    """
+    total_solved, total_nodes, total_time = 0, 0, 0.0
+    answers = []
+    for name, size, moves in positions:
+        solved, nodes, seconds, win = solve_position(size, moves, timelimit)
+        total_solved += solved
+        total_nodes += nodes
+        total_time += seconds
+        answers.append(win)
+    return total_solved, total_nodes, total_time, answers
+
+def wrong_answers(answers, expected):
+    """ Number of positions solved by both with different answers """
+    return sum(1 for answer, known in zip(answers, expected)
+               if answer is not None and known is not None
+               and answer != known)
+
+def candidate_weights(max_weight):
+    """
+    All (eye, neareye) pairs up to max_weight with eye > neareye.
+    Only the ratio of the weights matters for move ordering,
+    so multiples of a smaller pair are skipped.
+    """
+    candidates = []
+    for eye in range(1, max_weight + 1):
+        for neareye in range(0, eye):
+            if math.gcd(eye, neareye) == 1:
+                candidates.append((eye, neareye))
+    return candidates
+
+def tune(positions, timelimit, max_weight):
+    """
+    Grid search over the weight space.
+    Returns the best weights, ranked by solved positions, then nodes,
+    then time. Weights with a wrong answer are never chosen.
+    """
+    default = heuristic.get_weights()
+    solved, nodes, seconds, expected = measure(positions, timelimit)
+    print("default {} {}: solved {} nodes {} time {:.2f}".format(
+        default["EYEPOINTS"], default["NEAREYEPOINTS"],
+        solved, nodes, seconds))
+    best = (-solved, nodes, seconds, default["EYEPOINTS"],
+            default["NEAREYEPOINTS"])
+    for eye, neareye in candidate_weights(max_weight):
+        heuristic.set_weights(eye, neareye)
+        solved, nodes, seconds, answers = measure(positions, timelimit)
+        print("weights {} {}: solved {} nodes {} time {:.2f}".format(
+            eye, neareye, solved, nodes, seconds))
+        wrong = wrong_answers(answers, expected)
+        if wrong:
+            print("weights {} {}: {} wrong answers, rejected".format(
+                eye, neareye, wrong))
+            continue
+        result = (-solved, nodes, seconds, eye, neareye)
+        if result < best:
+            best = result
+    heuristic.set_weights(default["EYEPOINTS"], default["NEAREYEPOINTS"])
+    solved, nodes, seconds, eye, neareye = best
+    return {"EYEPOINTS": eye,
+            "NEAREYEPOINTS": neareye,
+            "CAPTUREPOINTS": default["CAPTUREPOINTS"],
+            "solved": -solved,
+            "nodes": nodes,
+            "time": round(seconds, 3)}
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Tune heuristic weights for solver speed")
+    parser.add_argument("files", nargs="*", default=DEFAULT_FILES)
+    parser.add_argument("--timelimit", type=float, default=10,
+                        help="seconds per position")
+    parser.add_argument("--max-weight", type=int, default=6)
+    parser.add_argument("--output", default=heuristic.WEIGHTS_FILE)
+    args = parser.parse_args()
+
+    positions = load_positions(args.files)
+    # Positions the default weights cannot solve only add noise
+    solvable = []
+    for position in positions:
+        name, size, moves = position
+        solved, nodes, seconds, win = solve_position(size, moves,
+                                                     args.timelimit)
+        print("{}: solved {} nodes {} time {:.2f}".format(
+            name, solved, nodes, seconds))
+        if solved:
+            solvable.append(position)
+    if not solvable:
+        print("No position solved within the timelimit")
+        return
+    best = tune(solvable, args.timelimit, args.max_weight)
+    print("best: {}".format(best))
+    with open(args.output, "w") as f:
+        json.dump(best, f, indent=4)
+
+if __name__ == '__main__':
+    main()